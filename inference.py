@@ -0,0 +1,280 @@
+
+# ------------------------------  ------------------------------
+# exact inference on a network as created by script.py
+# ------------------------------  ------------------------------
+# what the module does:
+#
+# - read a network back from an xbif file (or take the in-memory network of script.py)
+# - compile the network into factors (numpy arrays, one axis per variable)
+# - answer queries P(query | evidence) by variable elimination:
+#	+ only the ancestors of the query and evidence nodes are relevant (the rest sums up to 1)
+# 	+ the elimination order is chosen greedily (min-fill, then min-size)
+# 	+ for a batch of queries, all queries with the same evidence nodes share one compiled
+# 		joint factor P(query, evidence nodes), so every query is just a lookup & normalization
+# 	+ the compiled joint factors are cached in the compiled network
+#
+# usage (standalone):
+# 	python inference.py -x <network.xbif> -e <evidence.csv> -q <query node> [-o <posteriors.tsv>] [-d <csv delimiter>]
+# 	(the columns of the evidence csv file are named like the nodes; see also the 'query' command of script.py)
+
+# ============================== IMPORTS ==============================
+import sys
+import csv
+import time
+import string
+import collections
+from functools import reduce
+import operator
+from lxml import etree
+import numpy
+# ============================== CONSTANTS ==============================
+# ? the joint factor of the query and evidence nodes is only compiled if it has at most this many entries,
+# otherwise every query is answered on its own.
+MAX_JOINT_FACTOR_SIZE = 10000000;
+# ? numpy.einsum names the axes with letters.
+EINSUM_LETTERS = string.ascii_letters;
+# ============================== FUNCTIONS ==============================
+# (<I>) ------------------------------ READ XBIF ------------------------------
+def readXbifFile(pathToXbifFile):
+	# (F)
+	# ? builds a network with the same structure as the one in script.py: {nodeName: {'name','values','parents','children','cpd'}}
+	# The parents and children are the node dictionaries themselves.
+	# ? lxml also reads gzip compressed files (.xbif.gz) directly.
+	xmlTree = etree.parse(pathToXbifFile);
+	networkTag = xmlTree.getroot().find("NETWORK");
+	if networkTag is None:
+		raise ValueError("bad xbif file: missing tag 'NETWORK': "+pathToXbifFile);
+	network = collections.OrderedDict();
+	# > read the variables (L)
+	for variableTag in networkTag.findall("VARIABLE"):
+		nodeName = variableTag.findtext("NAME").strip();
+		values = [outcomeTag.text.strip() for outcomeTag in variableTag.findall("OUTCOME")];
+		network[nodeName] = {'name':nodeName, 'csvName':nodeName, 'values':values, 'parents':[], 'children':[]};
+	# > read the definitions (parents & cpds) (L)
+	for definitionTag in networkTag.findall("DEFINITION"):
+		nodeName = definitionTag.findtext("FOR").strip();
+		if nodeName not in network:
+			raise ValueError("bad xbif file: definition for unknown variable: "+nodeName);
+		node = network[nodeName];
+		for givenTag in definitionTag.findall("GIVEN"):
+			parent = network[givenTag.text.strip()];
+			node['parents'].append(parent);
+			parent['children'].append(node);
+		probabilities = [float(p) for p in definitionTag.findtext("TABLE").split()];
+		numberOfValues = len(node['values']);
+		node['cpd'] = [probabilities[i:i+numberOfValues] for i in range(0,len(probabilities),numberOfValues)];
+	return network;
+# (<I>) ------------------------------ COMPILE ------------------------------
+def compileNetwork(network):
+	# (F)
+	# ? the cpd of a node becomes a factor: an array with one axis per parent (in the order of the parents)
+	# and the last axis for the node itself. The rows of the cpd are in the order of script.generateConditions(),
+	# i.e. the last parent changes fastest, which is exactly numpy's (C-)order.
+	compiledNetwork = {'nodeNames':list(network.keys()), 'values':{}, 'indicesForValues':{}, 'parents':{}, 'factors':{}, 'cache':{}};
+	for nodeName,node in network.items():
+		parentNames = [parent['name'] for parent in node['parents']];
+		shape = [len(parent['values']) for parent in node['parents']] + [len(node['values'])];
+		cpdArray = numpy.array([[float(p) for p in cpdRow] for cpdRow in node['cpd']], dtype=numpy.float64);
+		if cpdArray.size != reduce(operator.mul, shape, 1):
+			raise ValueError("bad network: the cpd of '"+nodeName+"' does not fit its parents and values");
+		compiledNetwork['values'][nodeName] = list(node['values']);
+		compiledNetwork['indicesForValues'][nodeName] = {value:i for i,value in enumerate(node['values'])};
+		compiledNetwork['parents'][nodeName] = parentNames;
+		compiledNetwork['factors'][nodeName] = (tuple(parentNames+[nodeName]), cpdArray.reshape(shape));
+	return compiledNetwork;
+# (<I>) ------------------------------ VARIABLE ELIMINATION ------------------------------
+def getRelevantNodeNames(compiledNetwork, nodeNames):
+	# (F+)
+	# ? nodes that are not ancestors of the query/evidence nodes sum up to 1 and can be left out.
+	relevantNodeNames = set();
+	nodesToVisit = list(nodeNames);
+	while len(nodesToVisit) > 0:
+		nodeName = nodesToVisit.pop();
+		if nodeName in relevantNodeNames: continue;
+		relevantNodeNames.add(nodeName);
+		nodesToVisit.extend(compiledNetwork['parents'][nodeName]);
+	return relevantNodeNames;
+#
+def getEliminationOrder(compiledNetwork, scopes, variablesToEliminate):
+	# (F)
+	# ? greedy: always eliminate the variable that adds the fewest new edges to the interaction graph (min-fill),
+	# ties are broken by the size of the factor that its elimination creates (min-size).
+	cardinalities = {nodeName:len(values) for nodeName,values in compiledNetwork['values'].items()};
+	neighbours = collections.defaultdict(set);
+	for scope in scopes:
+		for variable in scope:
+			neighbours[variable].update([v for v in scope if v != variable]);
+	remainingVariables = set(variablesToEliminate);
+	eliminationOrder = [];
+	while len(remainingVariables) > 0:
+		def cost(variable):
+			variableNeighbours = list(neighbours[variable]);
+			fill = sum([1 for i in range(0,len(variableNeighbours)) for j in range(i+1,len(variableNeighbours)) if variableNeighbours[j] not in neighbours[variableNeighbours[i]]]);
+			size = reduce(operator.mul, [cardinalities[v] for v in variableNeighbours], 1);
+			return (fill, size, variable);
+		variable = min(remainingVariables, key=cost);
+		# > connect the neighbours of the variable and remove it from the graph (L)
+		for neighbour in neighbours[variable]:
+			neighbours[neighbour].update([v for v in neighbours[variable] if v != neighbour]);
+			neighbours[neighbour].discard(variable);
+		del neighbours[variable];
+		remainingVariables.remove(variable);
+		eliminationOrder.append(variable);
+	return eliminationOrder;
+#
+def multiplyFactors(factors, resultScope):
+	# (F+)
+	# > multiply the factors and sum out every variable that is not in the result scope (one einsum call) (L)
+	letters = {};
+	for (scope,_) in factors:
+		for variable in scope:
+			if variable not in letters:
+				if len(letters) >= len(EINSUM_LETTERS):
+					raise ValueError("too many variables in one factor product");
+				letters[variable] = EINSUM_LETTERS[len(letters)];
+	subscripts = ",".join(["".join([letters[v] for v in scope]) for (scope,_) in factors])+"->"+"".join([letters[v] for v in resultScope]);
+	return (tuple(resultScope), numpy.einsum(subscripts, *[array for (_,array) in factors]));
+#
+def eliminateVariables(compiledNetwork, factors, keptVariables):
+	# (F)
+	# ? sums out all variables except the kept ones and returns a single factor over the kept variables (in their order).
+	allVariables = set([variable for (scope,_) in factors for variable in scope]);
+	eliminationOrder = getEliminationOrder(compiledNetwork, [scope for (scope,_) in factors], allVariables - set(keptVariables));
+	factors = list(factors);
+	for variable in eliminationOrder:
+		# > multiply the factors that contain the variable and sum it out (L)
+		involvedFactors = [factor for factor in factors if variable in factor[0]];
+		otherFactors = [factor for factor in factors if variable not in factor[0]];
+		resultScope = [];
+		for (scope,_) in involvedFactors:
+			resultScope.extend([v for v in scope if v != variable and v not in resultScope]);
+		factors = otherFactors + [multiplyFactors(involvedFactors, resultScope)];
+	# > multiply what is left into a factor over the kept variables.
+	return multiplyFactors(factors, list(keptVariables));
+# (<I>) ------------------------------ QUERIES ------------------------------
+def getJointFactor(compiledNetwork, queryName, evidenceNames):
+	# (F)
+	# ? the joint factor P(evidence nodes..., query) answers every query with these evidence nodes. It is cached.
+	cacheKey = (queryName, tuple(evidenceNames));
+	if cacheKey not in compiledNetwork['cache']:
+		keptVariables = list(evidenceNames)+[queryName];
+		relevantNodeNames = getRelevantNodeNames(compiledNetwork, keptVariables);
+		factors = [compiledNetwork['factors'][nodeName] for nodeName in compiledNetwork['nodeNames'] if nodeName in relevantNodeNames];
+		(_,jointArray) = eliminateVariables(compiledNetwork, factors, keptVariables);
+		compiledNetwork['cache'][cacheKey] = jointArray;
+	return compiledNetwork['cache'][cacheKey];
+#
+def getPosterior(compiledNetwork, queryName, evidence):
+	# (F)
+	# ? a single query P(query | evidence), with evidence as a dictionary {nodeName:value}. Returns a numpy array
+	# over the values of the query node (all NaN if the evidence is impossible).
+	evidenceNames = [nodeName for nodeName in compiledNetwork['nodeNames'] if nodeName in evidence and nodeName != queryName];
+	evidenceIndices = tuple([getValueIndex(compiledNetwork, nodeName, evidence[nodeName]) for nodeName in evidenceNames]);
+	if getJointFactorSize(compiledNetwork, queryName, evidenceNames) <= MAX_JOINT_FACTOR_SIZE:
+		unnormalizedPosterior = getJointFactor(compiledNetwork, queryName, evidenceNames)[evidenceIndices];
+	else:
+		# ! the joint factor would be too big > reduce the factors to the evidence first. (L)
+		relevantNodeNames = getRelevantNodeNames(compiledNetwork, evidenceNames+[queryName]);
+		factors = [];
+		for nodeName in compiledNetwork['nodeNames']:
+			if nodeName not in relevantNodeNames: continue;
+			(scope,array) = compiledNetwork['factors'][nodeName];
+			index = tuple([evidenceIndices[evidenceNames.index(v)] if v in evidenceNames else slice(None) for v in scope]);
+			factors.append((tuple([v for v in scope if v not in evidenceNames]), array[index]));
+		(_,unnormalizedPosterior) = eliminateVariables(compiledNetwork, factors, [queryName]);
+	return normalize(unnormalizedPosterior);
+#
+def getPosteriorBatch(compiledNetwork, queryName, evidenceRows):
+	# (F)
+	# ? answers P(query | evidence) for a list of evidence dictionaries {nodeName:value} (missing nodes, None and ''
+	# mean 'not observed'). The queries are grouped by their evidence nodes, and every group is answered with one
+	# lookup in the group's joint factor. Returns an array (number of queries x values of the query node).
+	posteriors = numpy.full((len(evidenceRows), len(compiledNetwork['values'][queryName])), numpy.nan);
+	dict_rowIndicesForEvidenceNames = collections.OrderedDict();
+	for i,evidence in enumerate(evidenceRows):
+		evidenceNames = tuple([nodeName for nodeName in compiledNetwork['nodeNames'] if nodeName != queryName and evidence.get(nodeName) not in (None, "")]);
+		dict_rowIndicesForEvidenceNames.setdefault(evidenceNames, []).append(i);
+	for evidenceNames,rowIndices in dict_rowIndicesForEvidenceNames.items():
+		if getJointFactorSize(compiledNetwork, queryName, evidenceNames) > MAX_JOINT_FACTOR_SIZE:
+			# ! the joint factor would be too big > answer the queries of this group one by one. (L)
+			for i in rowIndices:
+				posteriors[i] = getPosterior(compiledNetwork, queryName, {nodeName:evidenceRows[i][nodeName] for nodeName in evidenceNames});
+			continue;
+		jointArray = getJointFactor(compiledNetwork, queryName, evidenceNames);
+		# > look up all queries of the group at once (one index array per evidence node) (L)
+		indexArrays = tuple([numpy.array([getValueIndex(compiledNetwork, nodeName, evidenceRows[i][nodeName]) for i in rowIndices]) for nodeName in evidenceNames]);
+		posteriors[rowIndices] = normalize(jointArray[indexArrays] if len(indexArrays) > 0 else numpy.tile(jointArray, (len(rowIndices),1)));
+	return posteriors;
+#
+def getJointFactorSize(compiledNetwork, queryName, evidenceNames):
+	# (F+)
+	return reduce(operator.mul, [len(compiledNetwork['values'][nodeName]) for nodeName in list(evidenceNames)+[queryName]], 1);
+#
+def getValueIndex(compiledNetwork, nodeName, value):
+	# (F+)
+	try:
+		return compiledNetwork['indicesForValues'][nodeName][value];
+	except KeyError:
+		raise ValueError("the value '"+str(value)+"' is not allowed for node '"+nodeName+"'");
+#
+def normalize(unnormalizedPosteriors):
+	# (F+)
+	# > divide by the sum over the last axis (the values of the query node); impossible evidence gives NaN. (L)
+	sums = unnormalizedPosteriors.sum(axis=-1, keepdims=True);
+	with numpy.errstate(invalid='ignore', divide='ignore'):
+		return numpy.where(sums > 0, unnormalizedPosteriors/sums, numpy.nan);
+# (<I>) ------------------------------ CSV ------------------------------
+def readEvidenceCsvFile(pathToEvidenceCsvFile, dict_nodeNamesForCsvNames, csvDelimiter='\t'):
+	# (F)
+	# ? the columns of the evidence csv file are named like the columns of the input csv file. Returns a list of
+	# dictionaries {nodeName:value}, one per row.
+	with open(pathToEvidenceCsvFile, 'r', newline='') as evidenceCsvFile:
+		evidenceRows = [];
+		for row in csv.DictReader(evidenceCsvFile, delimiter=csvDelimiter):
+			evidenceRows.append({dict_nodeNamesForCsvNames[columnName]:value for columnName,value in row.items() if columnName in dict_nodeNamesForCsvNames});
+	return evidenceRows;
+#
+def writePosteriorsFile(pathToPosteriorsFile, compiledNetwork, queryName, evidenceRows, posteriors):
+	# (F)
+	# > one line per query: the row number, the observed value of the query node (if any), the most probable value and the posterior (L)
+	values = compiledNetwork['values'][queryName];
+	with open(pathToPosteriorsFile, 'w', newline='') as posteriorsFile:
+		posteriorsWriter = csv.writer(posteriorsFile, delimiter='\t');
+		posteriorsWriter.writerow(["row", "observed "+queryName, "most probable "+queryName] + ["P("+queryName+"="+value+")" for value in values]);
+		for i,(evidence,posterior) in enumerate(zip(evidenceRows,posteriors)):
+			mostProbableValue = "" if numpy.isnan(posterior).any() else values[int(numpy.argmax(posterior))];
+			posteriorsWriter.writerow([i+1, evidence.get(queryName) or "", mostProbableValue] + ["{0:.6f}".format(p) for p in posterior]);
+# (<I>) ------------------------------ COMMAND LINE ------------------------------
+def main(arguments):
+	# (F)
+	options = {"-x":None, "-e":None, "-q":None, "-o":None, "-d":"\t"};
+	if len(arguments) % 2 != 0:
+		raise ValueError("bad arguments: every option needs a value");
+	for i in range(0,len(arguments),2):
+		if arguments[i] not in options:
+			raise ValueError("bad argument: "+arguments[i]);
+		options[arguments[i]] = arguments[i+1];
+	if options["-x"] is None or options["-e"] is None or options["-q"] is None:
+		raise ValueError("bad arguments: usage: python inference.py -x <network.xbif> -e <evidence.csv> -q <query node> [-o <posteriors.tsv>] [-d <csv delimiter>]");
+	# > read & compile the network (L)
+	network = readXbifFile(options["-x"]);
+	if options["-q"] not in network:
+		raise ValueError("bad argument: the query node does not exist: "+options["-q"]);
+	compiledNetwork = compileNetwork(network);
+	# > answer the queries (L)
+	evidenceRows = readEvidenceCsvFile(options["-e"], {nodeName:nodeName for nodeName in network.keys()}, bytes(options["-d"], "utf-8").decode("unicode_escape"));
+	startTime = time.time();
+	posteriors = getPosteriorBatch(compiledNetwork, options["-q"], evidenceRows);
+	duration = time.time()-startTime;
+	pathToPosteriorsFile = options["-o"] or options["-e"]+".posteriors.tsv";
+	writePosteriorsFile(pathToPosteriorsFile, compiledNetwork, options["-q"], evidenceRows, posteriors);
+	print("-- Answered {0} queries in {1:.3f}s ({2:.0f} queries/s), written to {3}.".format(len(evidenceRows), duration, len(evidenceRows)/max(duration,1e-9), pathToPosteriorsFile));
+# ============================== EXECUTION ==============================
+if __name__ == "__main__":
+	try:
+		main(sys.argv[1:]);
+	except (ValueError, IOError) as e:
+		print("ERROR: "+str(e), file=sys.stderr);
+		exit();
+# -------------------------
+# END OF FILE (L)
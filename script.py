@@ -9,11 +9,24 @@
 # what the script file does:
 # 
 # - interpret command line args like:
+# 	+ a command (optional):
+# 		* score: print log-likelihood, BIC & AIC of the network instead of writing it
+# 		* learn: search for better edges (starting from the configured ones) before writing the network
+# 		* query: answer P(query node | evidence) for every row of an evidence csv file after writing the network
 # 	+ path to config file (mandatory, a JSON-file)
 # 	+ path to input file (mandatory, a csv-fiel)
+# 		(can be given several times and may contain wildcards, e.g. one file per lab/site)
 # 	+ path to output file (optional, 
 # 		defaults to input file name with '.xbif' suffix)
+# 	+ a list of output formats (optional, e.g. xbif,xbif.gz,bif.xz,npz;
+# 		by default the format is taken from the output file name)
 # 	+ a custom csv field-separator (optional, default = \t)
+# 	+ path to a directory for count tables (optional, saved count tables
+# 		of unchanged input files are reused)
+# 	+ a number of bootstrap replicates (optional, writes cpd intervals
+# 		next to the output file)
+# 	+ query node & evidence file (for the query command, the posteriors
+# 		are written next to the output file)
 # - read the config file
 #	+ check for syntax errors
 #	+ check for the following information
@@ -22,7 +35,9 @@
 # 		* path to output directory 
 # 		* name of output xbiv file
 # 		* variable definitions (name & list of valid values)
+# 			(optionally: merge rare values into 'Other' or into similar values)
 # 		* connection definition (A -> B)
+# 		* structure search settings (optional)
 # - check for problems like:
 #	+ there is no wrapping dictionary at all
 # 	+ there is no preferences variable defined
@@ -34,18 +49,30 @@
 #   + duplicate relationships
 #   + circular relationships (including direct loop edges)
 # - calculate node-positions
+# - count every input file (in parallel) into count tables and sum them up
+# - collapse the csv rows to unique (weighted) rows of the relevant columns
+# - merge rare values (for nodes that ask for it)
 # - calculate NCPDs for the root nodes.
 # - calculate CPDs for the inner nodes.
-# - write the xbif data
+# - write the xbif data (and/or bif, npz; optionally gzip/xz compressed)
+# - (optionally) calculate & write bootstrap intervals for the CPDs
 
 # LX_OPTIONS: -v --lines -o ./ --fog_prefix "------------------------- FNC :: "
 # LX_OPTIONS: -v -tc -o ./ --short_output --fog_prefix "------------------------- FNC :: "
 
 
+# ? score : print the network score
+# ? learn : learn the edges (structure search)
+# ? query : answer queries (needs -q & -e)
 # ? -p : print incompatible nodes
 # ? -c : config file (JSON)
 # ? -i : input file (CSV)
 # ? -o : output file (XBIF)
+# ? -f : output formats
+# ? -t : count table directory (also keeps the family scores of score & learn)
+# ? --bootstrap : number of bootstrap replicates
+# ? -q : query node
+# ? -e : evidence file (CSV)
 # LX_ARGUMENTS: -c coinToss_config.json -i coinToss_input.csv -o cointoss.xbif -d '\t'
 # LX_ARGUMENTS: -c config.json -i Access_DB_Daten_TSV.csv -o output.xbif
 # LX_SWITCHES: -loops
@@ -55,29 +82,71 @@ import os
 import sys
 import cProfile;
 import json
+import gzip
+import lzma
+import glob
+import hashlib
+import multiprocessing
 from json_tricks.nonp import load as loadIgnoringComments
 import csv
 from lxml import etree
 import collections
 import re
+import math
 import itertools
 import copy
+import contextlib
 import time
 from decimal import *
 from functools import reduce
 import operator
+try:
+	import numpy
+except ImportError:
+	# ? numpy is only needed for the bootstrap and the queries.
+	numpy = None;
+try:
+	import inference
+except ImportError:
+	inference = None;
 # ============================== CONSTANTS ==============================
 # ------------------------------ misc ------------------------------
 # ? floating point numbers can have rounding errors. The rounding Errors have to  
 MIN_DECIMAL_ROUNDING_ERROR = Decimal('0.0000000000000001');
 SAMIAM_PRECISION = 16;
+# ? saved count tables with a different format version are ignored (and recounted).
+COUNT_TABLE_FORMAT_VERSION = 1;
+# ? saved family scores with a different format version are ignored (and calculated again).
+FAMILY_SCORE_FORMAT_VERSION = 1;
+# ? the maximum number of entries (replicates x conditions x values) the bootstrap holds in memory at once per node.
+BOOTSTRAP_BLOCK_SIZE = 5000000;
+# ? the compressions for text output formats (file suffixes) and the gzip level (lower = faster).
+OUTPUT_COMPRESSIONS = ["gz", "xz"];
+GZIP_COMPRESSION_LEVEL = 6;
 # ------------------------------ options ------------------------------
 OPTION__CONFIG_JSON_FILE = "-c";
 OPTION__INPUT_CSV_FILE = "-i";
 OPTION__OUTPUT_XBIF_FILE = "-o";
+OPTION__OUTPUT_FORMATS = "-f";
 OPTION__CSV_DELIMITER = "-d";
 OPTION__PRINT_INCOMPATIBLE_NODES = "-p";
 OPTION__PRINT_COMPATIBLE_NODES = "-P";
+OPTION__COUNT_TABLE_DIRECTORY = "-t";
+OPTION__BOOTSTRAP = "--bootstrap";
+OPTION__QUERY_NODE = "-q";
+OPTION__EVIDENCE_CSV_FILE = "-e";
+# ------------------------------ commands ------------------------------
+COMMAND__SCORE = "score";
+COMMAND__LEARN = "learn";
+COMMAND__QUERY = "query";
+COMMANDS = [COMMAND__SCORE, COMMAND__LEARN, COMMAND__QUERY];
+# ------------------------------ merge rare values ------------------------------
+MERGE_METHODS = ["other", "cooccurrence"];
+# ------------------------------ structure search ------------------------------
+# ? the scores the structure search can maximize, mapped to the keys of the family scores.
+STRUCTURE_SCORES = {"bic":"bic", "aic":"aic", "log_likelihood":"logLikelihood"};
+# ? score differences below this are rounding errors (e.g. reversing an edge between two otherwise unconnected nodes).
+MIN_STRUCTURE_SCORE_IMPROVEMENT = 1e-9;
 # ------------------------------ regex ------------------------------
 REGEX__CSV_DELIMITER = "^(?:\t| |,|;)$";
 REGEX__VALUE_STRING_FORMAT = "^.+$";
@@ -90,6 +159,14 @@ DEFAULT__CSV_DELIMITER = '\t';
 DEFAULT__GRID_SIZE_X = 50;
 DEFAULT__GRID_SIZE_Y = 100;
 DEFAULT__DATA_THRESHOLD = 0;
+DEFAULT__PRETTY_PRINT = True;
+DEFAULT__MERGE_METHOD = "other";
+DEFAULT__OTHER_VALUE = "Other";
+DEFAULT__BOOTSTRAP_CONFIDENCE = 0.95;
+DEFAULT__MAX_IN_DEGREE = 3;
+DEFAULT__TABU_LENGTH = 0;
+DEFAULT__MAX_ITERATIONS = 100;
+DEFAULT__STRUCTURE_SCORE = "bic";
 # ------------------------------ xbif document definition ------------------------------
 XML_DTD_XBIF = """\
 <?xml version="1.0" encoding="US-ASCII"?>
@@ -118,14 +195,35 @@ XML_DTD_XBIF = """\
 # ------------------------------ paths ------------------------------
 # path variables
 pathToConfigJsonFile = None;
-pathToInputCsvFile = None;
+pathsToInputCsvFiles = [];
 pathToOutputXbifFile = None;
+pathToCountTableDirectory = None;
+pathToEvidenceCsvFile = None;
 # ------------------------------ config ------------------------------
 # delimiter used to parse the csv file
 csvDelimiter = None;
 gridSizeX = DEFAULT__GRID_SIZE_X;
 gridSizeY = DEFAULT__GRID_SIZE_Y;
 dataThreshold = DEFAULT__DATA_THRESHOLD;
+prettyPrint = DEFAULT__PRETTY_PRINT;
+# ? the output formats (None = take the format from the output file name)
+outputFormats = None;
+numberOfBootstrapReplicates = 0;
+bootstrapConfidence = DEFAULT__BOOTSTRAP_CONFIDENCE;
+bootstrapSeed = None;
+# ? candidate edges of the structure search (None = every edge between two nodes)
+candidateEdges = None;
+forbiddenEdges = set();
+maxInDegree = DEFAULT__MAX_IN_DEGREE;
+tabuLength = DEFAULT__TABU_LENGTH;
+maxIterations = DEFAULT__MAX_ITERATIONS;
+structureScore = DEFAULT__STRUCTURE_SCORE;
+# ------------------------------ query ------------------------------
+queryNodeName = None;
+numberOfQueries = 0;
+queryDuration = 0;
+# ------------------------------ command ------------------------------
+command = None;
 # ------------------------------ flags ------------------------------
 flag_printIncompatibleNodes = False;
 flag_printCompatibleNodes = False;
@@ -137,6 +235,8 @@ dict_nodeComplexities = {};
 numberOfCalculatedPDs = 0;
 numberOfPDsWithLittleData = 0;
 numberOfSingleParentPDsWithLittleData = 0;
+numberOfCsvRows = 0;
+numberOfUniqueRows = 0;
 # ============================== FUNCTIONS ==============================
 def errorAndExit(message, exception=None):
 	errorString = "ERROR: "+message;
@@ -146,15 +246,21 @@ def errorAndExit(message, exception=None):
 	exit();
 # (I>)
 def parseCommandLineArguments():
-	global pathToConfigJsonFile, pathToInputCsvFile, pathToOutputXbifFile;
-	global csvDelimiter, flag_printIncompatibleNodes;
+	global pathToConfigJsonFile, pathsToInputCsvFiles, pathToOutputXbifFile, pathToCountTableDirectory;
+	global csvDelimiter, flag_printIncompatibleNodes, numberOfBootstrapReplicates, command;
+	global queryNodeName, pathToEvidenceCsvFile, outputFormats;
 	# (F)
 	expectedArgument = "OPTION";
 	# 
 	for i in range(1,len(sys.argv)):
 		argument = sys.argv[i];
 		# > process this {{argument}}..
-		if (expectedArgument == "OPTION") and (argument == OPTION__CONFIG_JSON_FILE):
+		if (expectedArgument == "OPTION") and (argument in COMMANDS):
+			# > remember the command (L)
+			if command is not None:
+				errorAndExit("bad argument: more than one command: "+argument);
+			command = argument;
+		elif (expectedArgument == "OPTION") and (argument == OPTION__CONFIG_JSON_FILE):
 			# > expect the config file path as the next argument (L)
 			expectedArgument = "CONFIG_JSON_FILE";
 		elif (expectedArgument == "CONFIG_JSON_FILE"):
@@ -172,9 +278,23 @@ def parseCommandLineArguments():
 			# > expect the input file path as the next argument (L)
 			expectedArgument = "INPUT_CSV_FILE";
 		elif (expectedArgument == "INPUT_CSV_FILE"):
-			# ! argument should be the input file path (L)
+			# ! argument should be the input file path or a pattern like 'site_*.csv' (L)
+			# > expand the pattern (L)
+			matchingPaths = sorted(glob.glob(argument));
+			if len(matchingPaths) == 0:
+				errorAndExit("bad argument: no input file matches: "+argument);
+			# > add the paths to the global list (L)
+			for path in matchingPaths:
+				if path not in pathsToInputCsvFiles:
+					pathsToInputCsvFiles.append(path);
+			expectedArgument = "OPTION";
+		elif (expectedArgument == "OPTION") and (argument == OPTION__COUNT_TABLE_DIRECTORY):
+			# > expect the count table directory as the next argument (L)
+			expectedArgument = "COUNT_TABLE_DIRECTORY";
+		elif (expectedArgument == "COUNT_TABLE_DIRECTORY"):
+			# ! argument should be the count table directory (L)
 			# > write it to a global variable (L)
-			pathToInputCsvFile = argument;
+			pathToCountTableDirectory = argument;
 			expectedArgument = "OPTION";
 		elif (expectedArgument == "OPTION") and (argument == OPTION__OUTPUT_XBIF_FILE):
 			# > expect the output file as the next argument (L)
@@ -184,6 +304,45 @@ def parseCommandLineArguments():
 			# > write it to a global variable (L)
 			pathToOutputXbifFile = argument;
 			expectedArgument = "OPTION";
+		elif (expectedArgument == "OPTION") and (argument == OPTION__BOOTSTRAP):
+			# > expect the number of bootstrap replicates as the next argument (L)
+			expectedArgument = "BOOTSTRAP";
+		elif (expectedArgument == "BOOTSTRAP"):
+			# ! argument should be the number of bootstrap replicates (L)
+			if not re.match("^[1-9][0-9]*$", argument):
+				errorAndExit("bad argument: the number of bootstrap replicates must be a positive integer: "+argument);
+			# > write it to a global variable (L)
+			numberOfBootstrapReplicates = int(argument);
+			expectedArgument = "OPTION";
+		elif (expectedArgument == "OPTION") and (argument == OPTION__QUERY_NODE):
+			# > expect the query node as the next argument (L)
+			expectedArgument = "QUERY_NODE";
+		elif (expectedArgument == "QUERY_NODE"):
+			# ! argument should be the name of the query node (L)
+			# > write it to a global variable (L)
+			queryNodeName = argument;
+			expectedArgument = "OPTION";
+		elif (expectedArgument == "OPTION") and (argument == OPTION__EVIDENCE_CSV_FILE):
+			# > expect the evidence file path as the next argument (L)
+			expectedArgument = "EVIDENCE_CSV_FILE";
+		elif (expectedArgument == "EVIDENCE_CSV_FILE"):
+			# ! argument should be the evidence file path (L)
+			# > write it to a global variable (L)
+			pathToEvidenceCsvFile = argument;
+			expectedArgument = "OPTION";
+		elif (expectedArgument == "OPTION") and (argument == OPTION__OUTPUT_FORMATS):
+			# > expect the output formats as the next argument (L)
+			expectedArgument = "OUTPUT_FORMATS";
+		elif (expectedArgument == "OUTPUT_FORMATS"):
+			# ! argument should be a comma separated list of output formats (L)
+			outputFormats = [];
+			for outputFormat in argument.split(","):
+				outputFormat = outputFormat.strip().lower();
+				if outputFormat not in getAllOutputFormats():
+					errorAndExit("bad argument: unknown output format '"+outputFormat+"' (known formats: "+", ".join(getAllOutputFormats())+")");
+				if outputFormat not in outputFormats:
+					outputFormats.append(outputFormat);
+			expectedArgument = "OPTION";
 		elif (expectedArgument == "OPTION") and (argument == OPTION__CSV_DELIMITER):
 			# > expect the csv delimiter as the next argument (L)
 			expectedArgument = "CSV_DELIMITER"
@@ -200,6 +359,10 @@ def parseCommandLineArguments():
 	# ! all arguments are parsed.
 	if pathToConfigJsonFile is None: 
 		errorAndExit("bad arguments: please provied a config file path (option: -i <path>)!");
+	if len(pathsToInputCsvFiles) == 0: 
+		errorAndExit("bad arguments: please provide an input file path (option: -i <path>)!");
+	if command == COMMAND__QUERY and (queryNodeName is None or pathToEvidenceCsvFile is None):
+		errorAndExit("bad arguments: the query command needs a query node and an evidence file (options: -q <node> -e <path>)!");
 # (<I>) ------------------------------ CONFIG JSON ------------------------------ 
 def parseConfigJsonFile():
 	try:
@@ -213,6 +376,7 @@ def parseConfigJsonFile():
 			parseConfigJsonFile_preferences(configJsonObject);
 			parseConfigJsonFile_nodes(configJsonObject);
 			parseConfigJsonFile_edges(configJsonObject);
+			parseConfigJsonFile_structureSearch(configJsonObject);
 			# 
 			checkNetworkForLoops()
 	except IOError as e:
@@ -259,6 +423,26 @@ def parseConfigJsonFile_preferences(configJsonObject):
 			errorAndExit("bad config file: the preferences field 'data_threshold' must be of type 'int'");
 		if gridSizeY < 0:
 			errorAndExit("bad config file: 'dataThreshold' cannot be negative");
+	# ------------------------------ pretty print ------------------------------
+	if "pretty_print" in preferences:
+		global prettyPrint;
+		prettyPrint = preferences['pretty_print'];
+		if type(prettyPrint) is not bool:
+			errorAndExit("bad config file: the preferences field 'pretty_print' must be of type 'bool'");
+	# ------------------------------ bootstrap confidence ------------------------------
+	if "bootstrap_confidence" in preferences:
+		global bootstrapConfidence;
+		bootstrapConfidence = preferences['bootstrap_confidence'];
+		if type(bootstrapConfidence) is not float:
+			errorAndExit("bad config file: the preferences field 'bootstrap_confidence' must be of type 'float'");
+		if not (0 < bootstrapConfidence < 1):
+			errorAndExit("bad config file: 'bootstrap_confidence' must be between 0 and 1");
+	# ------------------------------ bootstrap seed ------------------------------
+	if "bootstrap_seed" in preferences:
+		global bootstrapSeed;
+		bootstrapSeed = preferences['bootstrap_seed'];
+		if type(bootstrapSeed) is not int:
+			errorAndExit("bad config file: the preferences field 'bootstrap_seed' must be of type 'int'");
 # (<I>)
 def parseConfigJsonFile_nodes(configJsonObject):
 	# > get the 'nodes' field from the json object
@@ -340,6 +524,26 @@ def parseConfigJsonFile_nodes(configJsonObject):
 		# > extract 'row' and 'column' and write them to the coresponding network node
 		network[nodeName]['row'] = int(positionMatch.group('row'));
 		network[nodeName]['column'] = int(positionMatch.group('column'));
+		# > get the settings for merging rare values, if specified
+		if "merge_rare_values" in node:
+			network[nodeName]['mergeRareValues'] = parseConfigJsonFile_mergeRareValues(node["merge_rare_values"], "bad config file: node at index "+str(i));
+# 
+def parseConfigJsonFile_mergeRareValues(mergeRareValues, errorPrefix):
+	# (F+)
+	# ? e.g. "merge_rare_values": {"threshold": 5, "method": "other", "other_value": "Other"}
+	if type(mergeRareValues) is not collections.OrderedDict:
+		errorAndExit(errorPrefix+": the field 'merge_rare_values' must be of type 'dict'");
+	try: threshold = mergeRareValues["threshold"];
+	except: errorAndExit(errorPrefix+": 'merge_rare_values' > missing field: 'threshold'");
+	if type(threshold) is not int or threshold < 1:
+		errorAndExit(errorPrefix+": 'merge_rare_values' > 'threshold' must be a positive 'int'");
+	method = mergeRareValues.get("method", DEFAULT__MERGE_METHOD);
+	if method not in MERGE_METHODS:
+		errorAndExit(errorPrefix+": 'merge_rare_values' > 'method' must be one of: "+", ".join(MERGE_METHODS));
+	otherValue = mergeRareValues.get("other_value", DEFAULT__OTHER_VALUE);
+	if type(otherValue) is not str or not re.match(REGEX__VALUE_STRING_FORMAT,otherValue):
+		errorAndExit(errorPrefix+": 'merge_rare_values' > 'other_value' must be a valid value 'string'");
+	return {'threshold':threshold, 'method':method, 'otherValue':otherValue};
 # (<I>)
 def parseConfigJsonFile_edges(configJsonObject):
 	try:
@@ -351,24 +555,70 @@ def parseConfigJsonFile_edges(configJsonObject):
 		errorAndExit("bad config file: the field 'edges' must be of type 'array'");
 	# > loop over the edges...
 	for i in range(0,len(edges)):
-		edgeString = edges[i];
-		if type(edgeString) is not str:
-			errorAndExit("bad config file: edge at index "+str(i)+": edge must be of type 'string'")
-		# > match the edge string against the regex
-		edgeMatch = re.search(REGEX__EDGE, edgeString);
-		if edgeMatch is None:
-			errorAndExit("bad config file: edge at index "+str(i)+": has invalid format");
-		# > extract the names of source and target nodes from the match
-		sourceNodeName = edgeMatch.group('source');
-		targetNodeName = edgeMatch.group('target');
-		# > make sure the edge's source and target nodes exist
-		try: sourceNode = network[sourceNodeName];
-		except: errorAndExit("bad config file: edge at index "+str(i)+": source node does not exist: "+sourceNodeName);
-		try: targetNode = network[targetNodeName];
-		except: errorAndExit("bad config file: edge at index "+str(i)+": target node does not exist: "+targetNodeName);
+		(sourceNodeName, targetNodeName) = parseEdgeString(edges[i], "bad config file: edge at index "+str(i));
+		sourceNode = network[sourceNodeName];
+		targetNode = network[targetNodeName];
 		# > connect the parent/child nodes with each other 
 		sourceNode['children'].append(targetNode);
 		targetNode['parents'].append(sourceNode);
+# 
+def parseEdgeString(edgeString, errorPrefix):
+	# (F+)
+	if type(edgeString) is not str:
+		errorAndExit(errorPrefix+": edge must be of type 'string'")
+	# > match the edge string against the regex
+	edgeMatch = re.search(REGEX__EDGE, edgeString);
+	if edgeMatch is None:
+		errorAndExit(errorPrefix+": has invalid format");
+	# > extract the names of source and target nodes from the match
+	sourceNodeName = edgeMatch.group('source');
+	targetNodeName = edgeMatch.group('target');
+	# > make sure the edge's source and target nodes exist
+	if sourceNodeName not in network:
+		errorAndExit(errorPrefix+": source node does not exist: "+sourceNodeName);
+	if targetNodeName not in network:
+		errorAndExit(errorPrefix+": target node does not exist: "+targetNodeName);
+	return (sourceNodeName, targetNodeName);
+# (<I>)
+def parseConfigJsonFile_structureSearch(configJsonObject):
+	# (F)
+	# ? the field 'structure_search' is optional and only used by the 'learn' command.
+	if "structure_search" not in configJsonObject:
+		return;
+	structureSearch = configJsonObject["structure_search"];
+	if type(structureSearch) is not collections.OrderedDict:
+		errorAndExit("bad config file: the field 'structure_search' must be of type 'dict'");
+	global candidateEdges, forbiddenEdges, maxInDegree, tabuLength, maxIterations, structureScore;
+	# ------------------------------ candidate & forbidden edges ------------------------------
+	for fieldName in ["candidate_edges", "forbidden_edges"]:
+		if fieldName not in structureSearch:
+			continue;
+		edges = structureSearch[fieldName];
+		if type(edges) is not list:
+			errorAndExit("bad config file: the field 'structure_search' > '"+fieldName+"' must be of type 'array'");
+		parsedEdges = [parseEdgeString(edges[i], "bad config file: 'structure_search' > '"+fieldName+"' at index "+str(i)) for i in range(0,len(edges))];
+		if fieldName == "candidate_edges":
+			candidateEdges = parsedEdges;
+		else:
+			forbiddenEdges = set(parsedEdges);
+	# ------------------------------ numbers ------------------------------
+	if "max_in_degree" in structureSearch:
+		maxInDegree = structureSearch["max_in_degree"];
+		if type(maxInDegree) is not int or maxInDegree < 0:
+			errorAndExit("bad config file: 'structure_search' > 'max_in_degree' must be a non-negative 'int'");
+	if "tabu_length" in structureSearch:
+		tabuLength = structureSearch["tabu_length"];
+		if type(tabuLength) is not int or tabuLength < 0:
+			errorAndExit("bad config file: 'structure_search' > 'tabu_length' must be a non-negative 'int'");
+	if "max_iterations" in structureSearch:
+		maxIterations = structureSearch["max_iterations"];
+		if type(maxIterations) is not int or maxIterations < 0:
+			errorAndExit("bad config file: 'structure_search' > 'max_iterations' must be a non-negative 'int'");
+	# ------------------------------ score ------------------------------
+	if "score" in structureSearch:
+		structureScore = structureSearch["score"];
+		if structureScore not in STRUCTURE_SCORES:
+			errorAndExit("bad config file: 'structure_search' > 'score' must be one of: "+", ".join(STRUCTURE_SCORES));
 # (<I>)
 def checkNetworkForLoops():
 	# (F)
@@ -428,53 +678,413 @@ def checkNetworkForLoops():
 # (<I>) ------------------------------ INPUT CSV ------------------------------
 def parseInputCsvFile():
 	# (F)
-	global csvDelimiter;
+	global csvDelimiter, list_weightsForRowIndices, numberOfCsvRows, numberOfUniqueRows;
 	if csvDelimiter is None:
 		# ! no csv delimiter was assigned > use the default (L)
 		csvDelimiter = DEFAULT__CSV_DELIMITER;
 	# 
 	try:
-		with open(pathToInputCsvFile, 'r', newline='') as inputCsvFile:
+		# ? idea: the input may be split into several csv files (shards, e.g. one per lab/site). Every shard is
+		# parsed and counted on its own (in a separate process) into count tables, which can simply be summed up.
+		# The summed count tables are then used to calculate the CPDs. If a directory for count tables is given,
+		# the count tables of every shard are saved there and reused as long as the shard (and the network) did not change.
+		# ------------------------- 
+		# > get the count tables of every shard, either from the count table directory or by counting the shard.
+		shardCountTables = getShardCountTables(pathsToInputCsvFiles);
+		# > sum up the count tables of all shards (L)
+		rowCountTable = collections.OrderedDict();
+		dict_familyCountTables = {nodeName:{} for nodeName in network.keys()};
+		for shardCountTable in shardCountTables:
+			addCountTable(rowCountTable, shardCountTable['rows']);
+			for nodeName,familyCountTable in shardCountTable['families'].items():
+				addCountTable(dict_familyCountTables[nodeName], familyCountTable);
+		if any(['mergeRareValues' in node for node in network.values()]):
+			# > merge rare values (this changes the values of the nodes) > count the families again. (L)
+			rowCountTable = mergeRareValues(rowCountTable);
+			dict_familyCountTables = countFamilies(rowCountTable);
+			estimateComplexity();
+		# > get the unique rows of the relevant columns and their weights (L)
+		(uniqueRows, list_weightsForRowIndices) = unpackRowCountTable(rowCountTable);
+		# > count this for the statistics
+		numberOfCsvRows = sum(list_weightsForRowIndices);
+		numberOfUniqueRows = len(uniqueRows);
+
+		if flag_printIncompatibleNodes == True or flag_printCompatibleNodes == True:
+			# ! the user decided (via command line option) to print the list of incompatible nodes instead of normal execution.
+			printIncompatibleNodes(uniqueRows);
+			exit();
+		elif command == COMMAND__SCORE:
+			# ! the user wants to score the network instead of writing it.
+			# > reuse the family scores of earlier runs on the same data (e.g. for other edges) (L)
+			pathToFamilyScoresFile = getPathToFamilyScoresFile(shardCountTables);
+			loadFamilyScores(pathToFamilyScoresFile);
+			printNetworkScore(rowCountTable);
+			saveFamilyScores(pathToFamilyScoresFile);
+			exit();
+		else:
+			if command == COMMAND__LEARN:
+				# ! the user wants to learn the edges first.
+				pathToFamilyScoresFile = getPathToFamilyScoresFile(shardCountTables);
+				loadFamilyScores(pathToFamilyScoresFile);
+				learnNetworkStructure(rowCountTable);
+				saveFamilyScores(pathToFamilyScoresFile);
+				# > the parents changed > count the families again.
+				dict_familyCountTables = countFamilies(rowCountTable);
+				estimateComplexity();
+			# > calculate the CPDs for every node in the network.
+			calculateCPDs(dict_familyCountTables);
+			if numberOfBootstrapReplicates > 0:
+				# > calculate the intervals of the cpd entries.
+				calculateBootstrapIntervals(rowCountTable);
+	except IOError as e:
+		errorAndExit("could not read the input csv files!", e);
+	except Exception as e:
+		print("--------- unknown error within parseInputCsvFile()", file = sys.stderr);
+		raise;
+# (<I>)
+def getShardCountTables(pathsToShards):
+	# (F)
+	shardCountTables = [None]*len(pathsToShards);
+	pathsToCountTableFiles = [None]*len(pathsToShards);
+	# > try to reuse the saved count tables (L)
+	if pathToCountTableDirectory is not None:
+		networkFingerprint = getNetworkFingerprint();
+		for i,pathToShard in enumerate(pathsToShards):
+			pathsToCountTableFiles[i] = getPathToCountTableFile(pathToShard);
+			shardCountTables[i] = loadShardCountTable(pathsToCountTableFiles[i], pathToShard, networkFingerprint);
+	# > count the remaining shards (L)
+	indicesOfShardsToCount = [i for i in range(0,len(pathsToShards)) if shardCountTables[i] is None];
+	pathsToShardsToCount = [pathsToShards[i] for i in indicesOfShardsToCount];
+	if len(pathsToShardsToCount) > 1:
+		# ! there are several shards to count > count them in parallel, one process per shard. (L)
+		numberOfProcesses = min(len(pathsToShardsToCount), os.cpu_count() or 1);
+		with multiprocessing.Pool(numberOfProcesses, initializer=initializeWorker, initargs=getWorkerState()) as pool:
+			countedShardCountTables = pool.map(countInputCsvShard_inWorker, pathsToShardsToCount);
+		# > stop if a shard could not be counted (the worker already printed the error)
+		if None in countedShardCountTables:
+			exit();
+	else:
+		countedShardCountTables = [countInputCsvShard(pathToShard) for pathToShard in pathsToShardsToCount];
+	# > put the counted shards in place and save them for the next run (L)
+	for i,shardCountTable in zip(indicesOfShardsToCount, countedShardCountTables):
+		shardCountTables[i] = shardCountTable;
+		if pathToCountTableDirectory is not None:
+			saveShardCountTable(pathsToCountTableFiles[i], shardCountTable, networkFingerprint);
+	# 
+	return shardCountTables;
+# (<I>)
+def countInputCsvShard(pathToShard):
+	# (F)
+	try:
+		# > remember the content of the shard, so saved count tables can be checked against it.
+		shardFingerprint = getFileFingerprint(pathToShard);
+		with open(pathToShard, 'r', newline='') as inputCsvFile:
 			# ? a DictReader is a sequence of (ordered) dictionaries, each representing a
 			# row and the fields are indexed by the coldumn headers (as found in the first 
 			# line of the file).
 			# > get the DictReader and pull it into memory by converting it into a list.
 			csvFileAsList = list(csv.DictReader(inputCsvFile,delimiter=csvDelimiter));
-			# > make sure the input csv file is not empty
-			if len(csvFileAsList) == 0:
-				errorAndExit("bad input file: the csv file is empty: "+pathToInputCsvFile);
-			# > get the header names (L)
-			headerNames = csvFileAsList[0].keys(); 
-			# > make sure all the defined nodes (config file) exist in the csv file.
-			for csvName,_ in dict_csvNamesToNodeNames.items():
-				if csvName not in headerNames:
-					errorAndExit("bad csv file: cannot find name as defined in the config file: "+csvName)
-			# > check if all table entries are valid.
-			for row in csvFileAsList:
-				for columnName,value in row.items():
-					# > is this a relevant column?
-					if columnName in dict_csvNamesToNodeNames:
-						# ! this is a relevant column.
-						# > make sure the field contains a valid value 
-						allowedValues = network[dict_csvNamesToNodeNames[columnName]]['values'];
-						if (value is not None) and (value not in allowedValues):
-							# > the {{value}} is not allowed (L) {{allowedValues}}
-							errorAndExit("bad input file: the value '"+value+"' is not allowed in column '"+columnName+"'"+"\n\nContent of the row:\n"+csvDelimiter.join([str(v) for v in row.values()]) );
-
-			if flag_printIncompatibleNodes == True or flag_printCompatibleNodes == True:
-				# ! the user decided (via command line option) to print the list of incompatible nodes instead of normal execution.
-				printIncompatibleNodes(csvFileAsList);
-				exit();
-			else:
-				# > calculate the CPDs for every node in the network.
-				calculateCPDs(csvFileAsList);
-	except IOError:
-		errorAndExit("could not open the input csv file!");
-	except Exception as e:
-		print("--------- unknown error within parseInputCsvFile()", file = sys.stderr);
-		raise;
+	except IOError as e:
+		errorAndExit("could not open the input csv file: "+pathToShard, e);
+	# > make sure the input csv file is not empty
+	if len(csvFileAsList) == 0:
+		errorAndExit("bad input file: the csv file is empty: "+pathToShard);
+	# > get the header names (L)
+	headerNames = csvFileAsList[0].keys(); 
+	# > make sure all the defined nodes (config file) exist in the csv file.
+	for csvName,_ in dict_csvNamesToNodeNames.items():
+		if csvName not in headerNames:
+			errorAndExit("bad csv file: cannot find name as defined in the config file: "+csvName+" ("+pathToShard+")")
+	# > check if all table entries are valid.
+	for row in csvFileAsList:
+		for columnName,value in row.items():
+			# > is this a relevant column?
+			if columnName in dict_csvNamesToNodeNames:
+				# ! this is a relevant column.
+				# > make sure the field contains a valid value 
+				allowedValues = network[dict_csvNamesToNodeNames[columnName]]['values'];
+				if (value is not None) and (value not in allowedValues):
+					# > the {{value}} is not allowed (L) {{allowedValues}}
+					errorAndExit("bad input file: the value '"+value+"' is not allowed in column '"+columnName+"' ("+pathToShard+")"+"\n\nContent of the row:\n"+csvDelimiter.join([str(v) for v in row.values()]) );
+	# > collapse the rows to the unique configurations of the relevant columns (L)
+	rowCountTable = compactRows(csvFileAsList);
+	# > count the families of all nodes (L)
+	dict_familyCountTables = countFamilies(rowCountTable);
+	# 
+	return {'rows':rowCountTable, 'families':dict_familyCountTables, 'fingerprint':shardFingerprint};
+# 
+def countInputCsvShard_inWorker(pathToShard):
+	# (F+)
+	# ? errorAndExit() ends the worker process, which would leave the pool waiting forever. The error message
+	# is already printed at that point, so the worker only has to report that it failed.
+	try:
+		return countInputCsvShard(pathToShard);
+	except SystemExit:
+		return None;
+# 
+def getWorkerState():
+	# (F+)
+	return (network, dict_csvNamesToNodeNames, csvDelimiter);
+# 
+def initializeWorker(workerNetwork, workerCsvNamesToNodeNames, workerCsvDelimiter):
+	# (F+)
+	# ? worker processes do not necessarily inherit the globals (e.g. when processes are spawned instead of forked).
+	global network, dict_csvNamesToNodeNames, csvDelimiter;
+	network = workerNetwork;
+	dict_csvNamesToNodeNames = workerCsvNamesToNodeNames;
+	csvDelimiter = workerCsvDelimiter;
+# (<I>) ------------------------------ COUNT TABLES ------------------------------
+def compactRows(csvFileAsList):
+	# (F)
+	# ? idea: many rows of the csv file are identical once they are reduced to the columns that are
+	# used by the network (e.g. several outcomes of the same study that only differ in 'Outcome name').
+	# Instead of indexing and counting every one of them separately, we keep each of these projected rows
+	# only once and remember how often it occurred (its weight). Counting a set of row indices then means
+	# summing up the weights of those indices instead of taking the length of the set.
+	# The result is a count table: a dictionary of (projected row as a tuple):(weight)
+	# ------------------------- 
+	# > get a list of the column names (those in the csv file)
+	columnNames = [node['csvName'] for node in network.values()];
+	# > count the occurrences of every projected row (the insertion order keeps the order of the csv file)
+	rowCountTable = collections.OrderedDict();
+	for row in csvFileAsList:
+		projectedRow = tuple([row[columnName] for columnName in columnNames]);
+		rowCountTable[projectedRow] = rowCountTable.get(projectedRow, 0) + 1;
+	# 
+	return rowCountTable;
+# 
+def unpackRowCountTable(rowCountTable):
+	# (F+)
+	# > turn the projected rows back into dictionaries (indexed by the column names), the way the csv rows are.
+	columnNames = [node['csvName'] for node in network.values()];
+	uniqueRows = [dict(zip(columnNames, projectedRow)) for projectedRow in rowCountTable.keys()];
+	rowWeights = list(rowCountTable.values());
+	return (uniqueRows, rowWeights);
+# (<I>)
+def countFamilies(rowCountTable):
+	# (F)
+	# ? the family of a node is the node itself and its parents. The family count table of a node is a 
+	# dictionary of (parentValue1, parentValue2, ..., nodeValue):(number of csv rows), which is everything
+	# needed to calculate the node's cpd. Missing values (None) are counted as well, so that counts
+	# that ignore some of the parents (see approximateCpdRowForDataShortage()) can still be derived.
+	# Like the row count tables, family count tables of different shards can simply be summed up.
+	# ------------------------- 
+	columnNames = [node['csvName'] for node in network.values()];
+	dict_familyCountTables = {};
+	for nodeName,node in network.items():
+		# > get the positions of the family's columns within the projected rows.
+		familyColumnIndices = [columnNames.index(parent['csvName']) for parent in node['parents']] + [columnNames.index(node['csvName'])];
+		familyCountTable = {};
+		for projectedRow,weight in rowCountTable.items():
+			familyKey = tuple([projectedRow[i] for i in familyColumnIndices]);
+			familyCountTable[familyKey] = familyCountTable.get(familyKey, 0) + weight;
+		dict_familyCountTables[nodeName] = familyCountTable;
+	# 
+	return dict_familyCountTables;
+# 
+def addCountTable(targetCountTable, countTable):
+	# (F+)
+	# > sum the counts of the {{countTable}} into the {{targetCountTable}}.
+	for key,count in countTable.items():
+		targetCountTable[key] = targetCountTable.get(key, 0) + count;
+	return targetCountTable;
+# (<I>)
+def getFamilyCount(familyCountTable, nodeValues, conditionValues, value=None):
+	# (F+)
+	# ? counts the rows that match the condition (given as a tuple of parent values) and the value. If no value
+	# is specified, all rows with a (nonempty) value for the node are counted.
+	if value is None:
+		return sum([familyCountTable.get(conditionValues+(v,), 0) for v in nodeValues]);
+	return familyCountTable.get(conditionValues+(value,), 0);
+# 
+def getSingleParentCountTables(familyCountTable, numberOfParents):
+	# (F+)
+	# ? for every parent, reduce the family count table to a count table of (parentValue, nodeValue):(number of csv rows),
+	# i.e. the counts that only take this one parent into account.
+	singleParentCountTables = [{} for _ in range(0,numberOfParents)];
+	for familyKey,count in familyCountTable.items():
+		for i in range(0,numberOfParents):
+			reducedKey = (familyKey[i], familyKey[-1]);
+			singleParentCountTables[i][reducedKey] = singleParentCountTables[i].get(reducedKey, 0) + count;
+	return singleParentCountTables;
+# (<I>)
+def getNetworkFingerprint():
+	# (F+)
+	# ? the count tables of a shard depend on the csv delimiter, the nodes and their values, and the edges.
+	networkDescription = [csvDelimiter, COUNT_TABLE_FORMAT_VERSION];
+	for nodeName,node in network.items():
+		networkDescription.append([nodeName, node['csvName'], node['values'], [parent['name'] for parent in node['parents']]]);
+	return hashlib.sha1(json.dumps(networkDescription).encode('utf-8')).hexdigest();
+# 
+def getFileFingerprint(pathToFile):
+	# (F+)
+	with open(pathToFile, 'rb') as fileToHash:
+		return hashlib.sha1(fileToHash.read()).hexdigest();
+# 
+def getPathToCountTableFile(pathToShard):
+	# (F+)
+	# ? shards from different directories may have the same file name > add a hash of the full path.
+	pathHash = hashlib.sha1(os.path.abspath(pathToShard).encode('utf-8')).hexdigest()[:8];
+	return os.path.join(pathToCountTableDirectory, os.path.basename(pathToShard)+"."+pathHash+".counts.json");
+# 
+def loadShardCountTable(pathToCountTableFile, pathToShard, networkFingerprint):
+	# (F)
+	# > make sure there is a saved count table for this shard
+	if not os.path.isfile(pathToCountTableFile):
+		return None;
+	try:
+		with open(pathToCountTableFile, 'r') as countTableFile:
+			countTableJsonObject = json.load(countTableFile);
+	except (IOError, json.JSONDecodeError):
+		# ! the saved count table is not readable > just count the shard again (L)
+		return None;
+	# > make sure the saved count table is still valid for this shard and this network
+	if countTableJsonObject.get('network') != networkFingerprint:
+		return None;
+	if countTableJsonObject.get('shard') != getFileFingerprint(pathToShard):
+		return None;
+	# > convert the json lists [key1, key2, ..., count] back into count tables (L)
+	rowCountTable = collections.OrderedDict([(tuple(entry[:-1]), entry[-1]) for entry in countTableJsonObject['rows']]);
+	dict_familyCountTables = {};
+	for nodeName,entries in countTableJsonObject['families'].items():
+		dict_familyCountTables[nodeName] = {tuple(entry[:-1]):entry[-1] for entry in entries};
+	# 
+	return {'rows':rowCountTable, 'families':dict_familyCountTables, 'fingerprint':countTableJsonObject['shard']};
+# 
+def saveShardCountTable(pathToCountTableFile, shardCountTable, networkFingerprint):
+	# (F)
+	# ? json cannot use tuples as keys, so every entry of a count table is written as a list [key1, key2, ..., count].
+	countTableJsonObject = {
+		'network': networkFingerprint,
+		'shard': shardCountTable['fingerprint'],
+		'rows': [list(key)+[count] for key,count in shardCountTable['rows'].items()],
+		'families': {nodeName:[list(key)+[count] for key,count in familyCountTable.items()] for nodeName,familyCountTable in shardCountTable['families'].items()}
+	};
+	try:
+		os.makedirs(pathToCountTableDirectory, exist_ok=True);
+		with open(pathToCountTableFile, 'w') as countTableFile:
+			json.dump(countTableJsonObject, countTableFile);
+	except IOError as e:
+		errorAndExit("could not write the count table file: "+pathToCountTableFile, e);
+# (<I>) ------------------------------ MERGE RARE VALUES ------------------------------
+def mergeRareValues(rowCountTable):
+	# (F)
+	# ? idea: the size of a cpd is the product of the parents' numbers of values, so a parent with many rare values
+	# blows up the condition space (and most of those conditions end up with data shortage). For nodes with the
+	# preference 'merge_rare_values', the values with fewer rows than the threshold are merged:
+	# - method 'other': all rare values are merged into one value (default name: 'Other').
+	# - method 'cooccurrence': every rare value is merged into the frequent value that co-occurs most similarly with
+	# 	the values of the neighbouring nodes (cosine similarity); rare values that never occur go to 'Other'.
+	# The counts that drive the decision are collected in a single pass over the (compacted) rows. The merged
+	# values are remembered in the node ('mergedValues'), so they can be documented in the output.
+	# Returns the row count table with the merged values.
+	# ------------------------- 
+	nodeNames = list(network.keys());
+	nodesToMerge = [node for node in network.values() if 'mergeRareValues' in node];
+	if len(nodesToMerge) == 0:
+		return rowCountTable;
+	# > get the neighbours (parents & children) whose values are used for the co-occurrence profiles (L)
+	dict_neighbourNamesForNodeNames = {};
+	for node in nodesToMerge:
+		if node['mergeRareValues']['method'] == "cooccurrence":
+			neighbourNames = [parent['name'] for parent in node['parents']] + [child['name'] for child in node['children']];
+			if len(neighbourNames) == 0:
+				# ! a node without edges > use all other nodes. (L)
+				neighbourNames = [nodeName for nodeName in nodeNames if nodeName != node['name']];
+			dict_neighbourNamesForNodeNames[node['name']] = neighbourNames;
+	# ------------------------- statistics
+	# > count the values (and their co-occurrences with the neighbours' values) in a single pass (L)
+	dict_valueCountsForNodeNames = {node['name']:collections.Counter() for node in nodesToMerge};
+	dict_cooccurrenceCountsForNodeNames = {nodeName:collections.Counter() for nodeName in dict_neighbourNamesForNodeNames.keys()};
+	for projectedRow,weight in rowCountTable.items():
+		for node in nodesToMerge:
+			value = projectedRow[nodeNames.index(node['name'])];
+			if value is None: continue;
+			dict_valueCountsForNodeNames[node['name']][value] += weight;
+			for neighbourName in dict_neighbourNamesForNodeNames.get(node['name'], []):
+				neighbourValue = projectedRow[nodeNames.index(neighbourName)];
+				if neighbourValue is not None:
+					dict_cooccurrenceCountsForNodeNames[node['name']][(value, neighbourName, neighbourValue)] += weight;
+	(numberOfCpdCellsBefore, numberOfShortageRowsBefore) = getCpdStatistics(countFamilies(rowCountTable));
+	# ------------------------- decide
+	dict_valueMappingsForNodeNames = {};
+	for node in nodesToMerge:
+		settings = node['mergeRareValues'];
+		valueCounts = dict_valueCountsForNodeNames[node['name']];
+		rareValues = [value for value in node['values'] if valueCounts[value] < settings['threshold']];
+		frequentValues = [value for value in node['values'] if valueCounts[value] >= settings['threshold']];
+		valueMapping = {value:value for value in frequentValues};
+		if settings['method'] == "cooccurrence" and len(frequentValues) > 0:
+			cooccurrenceCounts = dict_cooccurrenceCountsForNodeNames[node['name']];
+			profileKeys = sorted(set([(neighbourName, neighbourValue) for (_,neighbourName,neighbourValue) in cooccurrenceCounts.keys()]));
+			def getProfile(value):
+				return [cooccurrenceCounts[(value,)+profileKey] for profileKey in profileKeys];
+			frequentProfiles = [(frequentValue, getProfile(frequentValue)) for frequentValue in frequentValues];
+			for rareValue in rareValues:
+				rareProfile = getProfile(rareValue);
+				if sum(rareProfile) == 0:
+					# ! the value never occurs together with the neighbours > it goes to the 'other' value (L)
+					valueMapping[rareValue] = settings['otherValue'];
+					continue;
+				valueMapping[rareValue] = max(frequentProfiles, key=lambda frequentProfile: getCosineSimilarity(rareProfile, frequentProfile[1]))[0];
+		else:
+			for rareValue in rareValues:
+				valueMapping[rareValue] = settings['otherValue'];
+		# > the new values: the kept values in their original order, then the 'other' value (if it is new) (L)
+		newValues = [value for value in node['values'] if value in frequentValues];
+		if settings['otherValue'] in valueMapping.values() and settings['otherValue'] not in newValues:
+			newValues.append(settings['otherValue']);
+		if len(newValues) == len(node['values']):
+			# ! nothing would be merged (e.g. a single rare value would just be renamed) (L)
+			print("-- merge rare values: nothing to merge for {0}".format(node['name']));
+			continue;
+		print("-- merge rare values: merged {0} rare values of {1} ({2} -> {3} values)".format(len(rareValues), node['name'], len(node['values']), len(newValues)));
+		# > write the new values and the mapping to the node (L)
+		node['originalValues'] = node['values'];
+		node['values'] = newValues;
+		node['valueMapping'] = valueMapping;
+		node['mergedValues'] = collections.OrderedDict();
+		for newValue in newValues:
+			originalValues = [value for value in node['originalValues'] if valueMapping[value] == newValue];
+			if originalValues != [newValue]:
+				node['mergedValues'][newValue] = originalValues;
+		dict_valueMappingsForNodeNames[node['name']] = valueMapping;
+	# ------------------------- apply
+	# > rewrite the rows with the merged values (rows can become identical, so their weights are summed) (L)
+	valueMappings = [dict_valueMappingsForNodeNames.get(nodeName) for nodeName in nodeNames];
+	mergedRowCountTable = collections.OrderedDict();
+	for projectedRow,weight in rowCountTable.items():
+		mergedRow = tuple([value if (valueMapping is None or value is None) else valueMapping[value] for (value,valueMapping) in zip(projectedRow,valueMappings)]);
+		mergedRowCountTable[mergedRow] = mergedRowCountTable.get(mergedRow, 0) + weight;
+	# > report the effect (L)
+	(numberOfCpdCellsAfter, numberOfShortageRowsAfter) = getCpdStatistics(countFamilies(mergedRowCountTable));
+	print("-- merge rare values: cpd cells {0} -> {1}, data shortage rows {2} -> {3}".format(
+		numberOfCpdCellsBefore, numberOfCpdCellsAfter, numberOfShortageRowsBefore, numberOfShortageRowsAfter));
+	return mergedRowCountTable;
+# 
+def getCosineSimilarity(vector1, vector2):
+	# (F+)
+	norm = math.sqrt(sum([x*x for x in vector1]))*math.sqrt(sum([x*x for x in vector2]));
+	if norm == 0:
+		return 0;
+	return sum([x*y for (x,y) in zip(vector1,vector2)])/norm;
+# 
+def getCpdStatistics(dict_familyCountTables):
+	# (F+)
+	# ? returns (number of cpd cells, number of cpd rows with data shortage) of the network for the given family counts.
+	numberOfCpdCells = 0;
+	numberOfShortageRows = 0;
+	for nodeName,node in network.items():
+		numberOfConditions = reduce(operator.mul, [len(parent['values']) for parent in node['parents']], 1);
+		numberOfCpdCells += numberOfConditions*len(node['values']);
+		dict_countsForConditions = {};
+		for familyKey,count in dict_familyCountTables[nodeName].items():
+			if None in familyKey: continue;
+			dict_countsForConditions[familyKey[:-1]] = dict_countsForConditions.get(familyKey[:-1], 0) + count;
+		numberOfShortageRows += numberOfConditions - len([count for count in dict_countsForConditions.values() if count > dataThreshold]);
+	return (numberOfCpdCells, numberOfShortageRows);
 # (<I>) ------------------------------ CALCULATE CPDs ------------------------------
-def calculateCPDs(csvFileAsList):
+def calculateCPDs(dict_familyCountTables):
 	# (F)
 	global numberOfCalculatedPDs, numberOfPDsWithLittleData, dict_nodeComplexities;
 	# > loop over the network nodes and calculate a cpd for each... (L)
@@ -493,6 +1103,9 @@ def calculateCPDs(csvFileAsList):
 			# ! the number of conditions is very high (L) (B) {{numberOfConditions}} (I)
 		# > get this node's column name in the csv data base.
 		columnName = node['csvName'];
+		# > get this node's family count table and reduce it to the counts for each single parent.
+		familyCountTable = dict_familyCountTables[nodeName];
+		singleParentCountTables = getSingleParentCountTables(familyCountTable, len(node['parents']));
 		# # ------------------------------ >>> ------------------------------
 		# counter = 0;
 		# for condition in conditions:
@@ -512,18 +1125,20 @@ def calculateCPDs(csvFileAsList):
 				sys.stdout.flush()
 				# time.sleep(0.5);
 				# (B:this takes too long!) (I)__ secondCounter%100==0 __ 
+			# > get the parent values of this condition
+			conditionValues = tuple([parentValue for (_,parentValue) in condition]);
 			# > create new cpd row
 			# ? a row represents the variable's propbability distribution for this condition. It has to sum to 1.
 			cpdRow = [];
 			# > calculate the number of csv rows that match this condition
-			numberOfRowsThatMatchCondition = getRowCount(csvFileAsList, columnName, condition=condition);
+			numberOfRowsThatMatchCondition = getFamilyCount(familyCountTable, node['values'], conditionValues);
 			# > make sure there is enough data for this condition.
 			if numberOfRowsThatMatchCondition > dataThreshold:
 				# ! this condition DOES fit enough database entries to calculate a cpd.
 				# > calculate the cpd row.
 				for value in node['values']:
 					# > get the number of rows that match this condition and this value.
-					numberOfRowsThatMatchConditionAndValue = getRowCount(csvFileAsList, columnName, value, condition); 
+					numberOfRowsThatMatchConditionAndValue = getFamilyCount(familyCountTable, node['values'], conditionValues, value); 
 					# > calculate the propbability for this value under the given condition. 
 					# print("%r / %r" % (numberOfRowsThatMatchConditionAndValue,numberOfRowsThatMatchCondition))
 					conditionalProbability = roundForSamiam( Decimal(numberOfRowsThatMatchConditionAndValue) / Decimal(numberOfRowsThatMatchCondition) );
@@ -535,7 +1150,7 @@ def calculateCPDs(csvFileAsList):
 				# ! this condition does NOT fit enough database entries to calculate a cpd. (L)
 				# => normal calculation would create a non stochastic cpd row of [0 0 0...] (L)
 				# > calculate the cpd row in a different way. (L)
-				cpdRow = approximateCpdRowForDataShortage(csvFileAsList, columnName, node['values'], condition);
+				cpdRow = approximateCpdRowForDataShortage(singleParentCountTables, node['values'], conditionValues);
 				# > count this for the statistics
 				numberOfPDsWithLittleData += 1;
 			assert(sum(cpdRow) == 1), " + ".join(map(lambda p: str(p), cpdRow)) + " = " + str(sum(cpdRow));
@@ -549,26 +1164,26 @@ def calculateCPDs(csvFileAsList):
 
 	#
 # (<I>)
-def approximateCpdRowForDataShortage(csvFileAsList, columnName, nodeValues, condition):
+def approximateCpdRowForDataShortage(singleParentCountTables, nodeValues, conditionValues):
 	global numberOfSingleParentPDsWithLittleData;
-	# ! the condition not matched by enough rows. (L) (F) {{columnName}} {{condition}} {{nodeValues}}
+	# ! the condition not matched by enough rows. (L) (F) {{conditionValues}} {{nodeValues}}
 	# ? how do we solve this? Since there is not enough data for this condition, we try to reduce the
 	# the condition by looking at each parent separately (instead of the strict value combination of all of them).
 	# The cpd row is generated for each parent and all of them are summed up & normalized to calculate the final cpd row that is returned by the function: cpdRow = cpdRowForParent1 + cpdRowForParent2 + ... / numberOfParents
 	# If there isn't even enough data to calculate the cpd row for one of the parents, then the uniform distribution is used ([1/n,...,1/n], with n=#values) since that is the choice with the maximum entropy (=> represents the highest uncertainty).
 	# ------------------------- 
-	numberOfParents = len(condition);
+	numberOfParents = len(conditionValues);
 	numberOfValues = len(nodeValues);
 	# > calcualte the uniform distribution (L)
 	uniformDistribution = [1/Decimal(numberOfValues)]*numberOfValues;
 	# > initialize the cpd row with zeros. (L) 
 	unnormalizedCpdRow = [0]*numberOfValues;
-	for (parentName,parentValue) in condition: 
-		# loop: {{parentName}} {{parentValue}} (L)
+	for (singleParentCountTable,parentValue) in zip(singleParentCountTables,conditionValues): 
+		# loop: {{parentValue}} (L)
 		cpdRowForThisParent = [];
 		# > create a reduced condition that only takes this specific parent into account.
-		reducedCondition = [(parentName,parentValue)];
-		numberOfRowsThatMatchCondition = getRowCount(csvFileAsList, columnName, condition=reducedCondition);
+		reducedConditionValues = (parentValue,);
+		numberOfRowsThatMatchCondition = getFamilyCount(singleParentCountTable, nodeValues, reducedConditionValues);
 		# 
 		if numberOfRowsThatMatchCondition <= dataThreshold:
 			# ! this parent's column does not contain this value at all!
@@ -579,7 +1194,7 @@ def approximateCpdRowForDataShortage(csvFileAsList, columnName, nodeValues, cond
 		else:
 			# ! there ARE enough rows that matched the reduced condition to generate the partial cpd row (L)
 			for value in nodeValues:
-				numberOfRowsThatMatchConditionAndValue = getRowCount(csvFileAsList,columnName,value,reducedCondition);
+				numberOfRowsThatMatchConditionAndValue = getFamilyCount(singleParentCountTable, nodeValues, reducedConditionValues, value);
 				# > calculate the propbability for this value under the given condition. 
 				# print("%r / %r = %r" % (numberOfRowsThatMatchConditionAndValue,numberOfRowsThatMatchCondition,
 					# numberOfRowsThatMatchConditionAndValue/numberOfRowsThatMatchCondition));
@@ -656,6 +1271,8 @@ def generateConditions(node):
 	return conditions;
 # (<I>)
 dict_indicesForNodeAndValue = None;
+# ? the weight (=number of occurrences in the csv file) of every row, indexed like the rows themselves (see compactRows()).
+list_weightsForRowIndices = None;
 def getRowCount_prepareDataStructure(csvFileAsList):
 	global dict_indicesForNodeAndValue;
 	# (F)
@@ -663,6 +1280,7 @@ def getRowCount_prepareDataStructure(csvFileAsList):
 	# contains the set of data-entry-indices (line numbers) for every combination 
 	# of columnName and value (for values that are allowed in that column).
 	# This way the question of #(lines that match N1(a)&N2(b)&N3(c) can be calculated as an indersection of three sets);
+	# ? the rows are the unique (compacted) rows, so every index stands for as many csv lines as its weight.
 	# ------------------------- 
 	# > initiate the datastructure as an empty dictionary
 	dict_indicesForNodeAndValue = {};
@@ -707,7 +1325,7 @@ def getRowCount(csvFileAsList, columnName, value=None, condition=[]):
 	# ------------------------- handle trivial case efficiently
 	if value is None and len(condition) == 0:
 		# > return the number of nonempty rows for this column.
-		return sum([len(indexSet) for indexSet in dict_indicesForNodeAndValue[columnName].values()]);
+		return sum([getRowCount_sumOfWeights(indexSet) for indexSet in dict_indicesForNodeAndValue[columnName].values()]);
 	# ------------------------- handle non-trivial cases...
 	# > initiate the working variable.
 	matchingRows = None;
@@ -736,55 +1354,742 @@ def getRowCount(csvFileAsList, columnName, value=None, condition=[]):
 		# > reduce the matching rows to only those who also match the condition.
 		matchingRows = matchingRows.intersection(rowsThatMatchCondition);
 	# ------------------------- done
-	# > return the length of the list (= the number or matching rows);
-	return len(matchingRows)
+	# > return the summed weights of the matching rows (= the number of matching csv lines);
+	return getRowCount_sumOfWeights(matchingRows)
+# 
+def getRowCount_sumOfWeights(indexSet):
+	# (F+)
+	if list_weightsForRowIndices is None:
+		# ! the rows were not compacted > every row counts once (L)
+		return len(indexSet);
+	return sum([list_weightsForRowIndices[index] for index in indexSet]);
 # (<I)
 
-# ------------------------------ OUTPUT XBIF ------------------------------
-def writeOutputXbifFile():
+# (<I>) ------------------------------ SCORE ------------------------------
+# ? the scores of the families that were already calculated, indexed by (nodeName, (parentName1, parentName2, ...)).
+dict_familyScoresForFamilies = {};
+def getFamilyScore(rowCountTable, nodeName, parentNames):
+	# (F+)
+	# ? the score of a network is the sum of the scores of its families (decomposable score). A family's score
+	# only depends on the node and the set of its parents, so it is calculated only once (the parents are
+	# sorted, since their order does not matter). With a count table directory, the family scores are also
+	# saved there (see saveFamilyScores()), so later runs with other edges only calculate the families that changed.
+	familyKey = (nodeName, tuple(sorted(parentNames)));
+	if familyKey not in dict_familyScoresForFamilies:
+		dict_familyScoresForFamilies[familyKey] = calculateFamilyScore(rowCountTable, nodeName, familyKey[1]);
+	return dict_familyScoresForFamilies[familyKey];
+# (<I>)
+def calculateFamilyScore(rowCountTable, nodeName, parentNames):
+	# (F)
+	# ? the log-likelihood of the data under the cpd of a node is sum(count(condition,value) * log(P(value|condition))).
+	# Only the conditions that occur in the data contribute to it, so only those are looked at. The conditional
+	# propbabilities are calculated the way calculateCPDs() does it (including the approximation for data shortage).
+	# Every condition has (#values - 1) free parameters, which are used for the penalties of BIC and AIC.
+	# ------------------------- 
+	node = network[nodeName];
+	numberOfParents = len(parentNames);
+	numberOfConditions = reduce(operator.mul, [len(network[parentName]['values']) for parentName in parentNames], 1);
+	# > count the family and group the counts by condition (L)
+	familyCountTable = countFamily(rowCountTable, nodeName, parentNames);
+	dict_countsForConditions = {};
+	for familyKey,count in familyCountTable.items():
+		# > ignore rows with missing values (they do not match any condition/value) (L)
+		if None in familyKey: continue;
+		dict_countsForValues = dict_countsForConditions.setdefault(familyKey[:-1], {});
+		dict_countsForValues[familyKey[-1]] = dict_countsForValues.get(familyKey[-1], 0) + count;
+	# > sum up the log-likelihood over the conditions (L)
+	logLikelihood = 0.0;
+	numberOfConditionsWithEnoughData = 0;
+	singleParentCountTables = None;
+	for conditionValues,dict_countsForValues in dict_countsForConditions.items():
+		numberOfRowsThatMatchCondition = sum(dict_countsForValues.values());
+		if numberOfRowsThatMatchCondition > dataThreshold:
+			numberOfConditionsWithEnoughData += 1;
+			dict_probabilitiesForValues = {value:count/numberOfRowsThatMatchCondition for value,count in dict_countsForValues.items()};
+		elif numberOfParents > 0:
+			# ! this condition does NOT fit enough database entries > use the approximated cpd row. (L)
+			if singleParentCountTables is None:
+				singleParentCountTables = getSingleParentCountTables(familyCountTable, numberOfParents);
+			cpdRow = approximateCpdRowForDataShortage(singleParentCountTables, node['values'], conditionValues);
+			dict_probabilitiesForValues = dict(zip(node['values'], [float(p) for p in cpdRow]));
+		else:
+			# ! a root node without enough data > use the uniform distribution. (L)
+			dict_probabilitiesForValues = {value:1/len(node['values']) for value in node['values']};
+		for value,count in dict_countsForValues.items():
+			logLikelihood += count*math.log(dict_probabilitiesForValues[value]);
+	# 
+	numberOfParameters = (len(node['values'])-1)*numberOfConditions;
+	return {
+		'logLikelihood': logLikelihood,
+		'parameters': numberOfParameters,
+		'bic': logLikelihood - numberOfParameters/2*math.log(max(numberOfCsvRows,1)),
+		'aic': logLikelihood - numberOfParameters,
+		'conditions': numberOfConditions,
+		'shortageConditions': numberOfConditions - numberOfConditionsWithEnoughData
+	};
+# (<I>)
+def countFamily(rowCountTable, nodeName, parentNames):
+	# (F+)
+	# > count the family of the node for the given parents (which do not have to be the parents in the network) (L)
+	columnNames = [node['csvName'] for node in network.values()];
+	familyColumnIndices = [columnNames.index(network[parentName]['csvName']) for parentName in parentNames] + [columnNames.index(network[nodeName]['csvName'])];
+	familyCountTable = {};
+	for projectedRow,weight in rowCountTable.items():
+		familyKey = tuple([projectedRow[i] for i in familyColumnIndices]);
+		familyCountTable[familyKey] = familyCountTable.get(familyKey, 0) + weight;
+	return familyCountTable;
+# (<I>)
+def printNetworkScore(rowCountTable):
 	# (F)
-	xmlNetwork = createXmlFromNetwork()
-	xmlNetworkAsString = "\n\n"+str(etree.tostring(xmlNetwork, pretty_print=True),encoding='utf-8');
+	print("-------------------------")
+	print("NETWORK SCORE ({0} csv rows, natural logarithm):".format(numberOfCsvRows))
+	print("{0:<24} {1:>14} {2:>10} {3:>14} {4:>14} {5:>16}".format("node", "log-likelihood", "parameters", "BIC", "AIC", "shortage rows"));
+	totalScore = {'logLikelihood':0.0, 'parameters':0, 'bic':0.0, 'aic':0.0, 'conditions':0, 'shortageConditions':0};
+	for nodeName,node in network.items():
+		familyScore = getFamilyScore(rowCountTable, nodeName, [parent['name'] for parent in node['parents']]);
+		printNetworkScore_line(nodeName, familyScore);
+		for key in totalScore.keys():
+			totalScore[key] += familyScore[key];
+	printNetworkScore_line("TOTAL", totalScore);
+# 
+def printNetworkScore_line(name, score):
+	# (F+)
+	shortageShare = score['shortageConditions']/score['conditions']*100;
+	print("{0:<24} {1:>14.3f} {2:>10} {3:>14.3f} {4:>14.3f} {5:>7}/{6:<8}".format(
+		name, score['logLikelihood'], score['parameters'], score['bic'], score['aic'], score['shortageConditions'], score['conditions'])
+		+" ({0:.2f}%)".format(shortageShare));
+# (<I>)
+def getPathToFamilyScoresFile(shardCountTables):
+	# (F+)
+	# ? the family scores depend on the data (the shards), the nodes and their values (after merging rare values)
+	# and the data threshold, but not on the edges. So every network variant with the same data and nodes shares
+	# one file. Returns None if there is no count table directory.
+	if pathToCountTableDirectory is None:
+		return None;
+	scoreDescription = [csvDelimiter, FAMILY_SCORE_FORMAT_VERSION, str(dataThreshold), sorted([shardCountTable['fingerprint'] for shardCountTable in shardCountTables])];
+	for nodeName,node in network.items():
+		scoreDescription.append([nodeName, node['csvName'], node['values'], sorted(node.get('valueMapping', {}).items())]);
+	scoreFingerprint = hashlib.sha1(json.dumps(scoreDescription).encode('utf-8')).hexdigest();
+	return os.path.join(pathToCountTableDirectory, "family_scores."+scoreFingerprint+".json");
+# 
+def loadFamilyScores(pathToFamilyScoresFile):
+	# (F+)
+	# > add the saved family scores to the memoized ones (L)
+	if pathToFamilyScoresFile is None or not os.path.isfile(pathToFamilyScoresFile):
+		return;
 	try:
-		#
-		with open(pathToOutputXbifFile, 'w', newline='') as outputXbifFile:
-			outputXbifFile.write(XML_DTD_XBIF)
-			outputXbifFile.write(xmlNetworkAsString)
+		with open(pathToFamilyScoresFile, 'r') as familyScoresFile:
+			familyScoresJsonObject = json.load(familyScoresFile);
+	except (IOError, json.JSONDecodeError):
+		# ! the saved family scores are not readable > just calculate them again (L)
+		return;
+	for (nodeName, parentNames, familyScore) in familyScoresJsonObject['families']:
+		dict_familyScoresForFamilies[(nodeName, tuple(parentNames))] = familyScore;
+	print("-- Reusing {0} saved family scores from {1}".format(len(familyScoresJsonObject['families']), pathToFamilyScoresFile));
+# 
+def saveFamilyScores(pathToFamilyScoresFile):
+	# (F+)
+	# ? json cannot use tuples as keys, so every family is written as a list [nodeName, [parentName1, ...], score].
+	if pathToFamilyScoresFile is None:
+		return;
+	familyScoresJsonObject = {
+		'families': [[nodeName, list(parentNames), familyScore] for (nodeName,parentNames),familyScore in dict_familyScoresForFamilies.items()]
+	};
+	try:
+		os.makedirs(pathToCountTableDirectory, exist_ok=True);
+		with open(pathToFamilyScoresFile, 'w') as familyScoresFile:
+			json.dump(familyScoresJsonObject, familyScoresFile);
 	except IOError as e:
-		errorAndExit("could not write to output file: "+pathToOutputXbifFile,e);
-	except Exception as e:
-		print("unknown error!");
-		raise;
+		errorAndExit("could not write the family scores file: "+pathToFamilyScoresFile, e);
+# (<I>) ------------------------------ STRUCTURE SEARCH ------------------------------
+def learnNetworkStructure(rowCountTable):
+	# (F)
+	# ? idea: starting from the configured edges, the edges are changed one at a time (add, remove or reverse an edge),
+	# always choosing the move that improves the network score the most (hill climbing). With a tabu length > 0, the
+	# best move is taken even if it makes the score worse, but the last moved edges must not be moved back for a while
+	# (tabu search); this way the search can get out of local optima. The best network seen is kept.
+	# Since the score is decomposable, a move only changes the scores of one family (two when reversing), and the
+	# family scores are memoized (see getFamilyScore()), so only families that were never seen have to be calculated.
+	# These are calculated in parallel.
+	# ------------------------- 
+	scoreKey = STRUCTURE_SCORES[structureScore];
+	nodeNames = list(network.keys());
+	# > get the current parents of every node (L)
+	dict_parentsForNodeNames = {nodeName:[parent['name'] for parent in node['parents']] for nodeName,node in network.items()};
+	# > get the edges that may be added (L)
+	if candidateEdges is None:
+		allowedEdges = [(source,target) for source in nodeNames for target in nodeNames if source != target];
+	else:
+		allowedEdges = list(candidateEdges);
+	allowedEdges = [edge for edge in allowedEdges if edge not in forbiddenEdges];
+	# 
+	def getScore(nodeName, parentNames):
+		return getFamilyScore(rowCountTable, nodeName, parentNames)[scoreKey];
+	def getScoreDelta(move):
+		(_,_,changedFamilies) = move;
+		return sum([getScore(nodeName, parentNames) - getScore(nodeName, dict_parentsForNodeNames[nodeName]) for (nodeName,parentNames) in changedFamilies]);
+	# 
+	# > repair the families that have more parents than allowed (the configured edges do not have to obey the limit):
+	# remove their parent edges one at a time, the one that costs the least score first. (L)
+	while any([len(parentNames) > maxInDegree for parentNames in dict_parentsForNodeNames.values()]):
+		# ? while there is such a family, the only moves are the removals of its parent edges (see getStructureMoves()).
+		(description, _, changedFamilies) = max(getStructureMoves(dict_parentsForNodeNames, allowedEdges, []), key=getScoreDelta);
+		for (nodeName,parentNames) in changedFamilies:
+			dict_parentsForNodeNames[nodeName] = parentNames;
+		print("-- structure search: max in-degree ({0}): {1}".format(maxInDegree, description));
+	# 
+	currentScore = sum([getScore(nodeName, parentNames) for nodeName,parentNames in dict_parentsForNodeNames.items()]);
+	bestScore = currentScore;
+	bestParents = copy.deepcopy(dict_parentsForNodeNames);
+	print("-- structure search: start score ({0}) = {1:.3f}".format(structureScore, currentScore));
+	# > the tabu list holds the edges (source,target) that must not be changed for now
+	tabuEdges = collections.deque(maxlen=max(tabuLength,1));
+	numberOfIterationsWithoutImprovement = 0;
+	numberOfProcesses = os.cpu_count() or 1;
+	with multiprocessing.Pool(numberOfProcesses, initializer=initializeScoreWorker, initargs=getScoreWorkerState(rowCountTable)) if numberOfProcesses > 1 else contextlib.nullcontext() as pool:
+		for iteration in range(0,maxIterations):
+			# > collect the possible moves: (description, [(nodeName, newParents), ...]) (L)
+			moves = getStructureMoves(dict_parentsForNodeNames, allowedEdges, tabuEdges if tabuLength > 0 else []);
+			if len(moves) == 0:
+				break;
+			# > calculate the family scores that are not memoized yet, in parallel (L)
+			missingFamilies = set();
+			for (_,_,changedFamilies) in moves:
+				for (nodeName,parentNames) in changedFamilies:
+					familyKey = (nodeName, tuple(sorted(parentNames)));
+					if familyKey not in dict_familyScoresForFamilies:
+						missingFamilies.add(familyKey);
+			missingFamilies = list(missingFamilies);
+			if pool is not None and len(missingFamilies) > 1:
+				familyScores = pool.map(calculateFamilyScore_inWorker, missingFamilies);
+			else:
+				familyScores = [calculateFamilyScore(rowCountTable, nodeName, parentNames) for (nodeName,parentNames) in missingFamilies];
+			dict_familyScoresForFamilies.update(zip(missingFamilies, familyScores));
+			# > find the best move (L)
+			bestMove = None;
+			bestDelta = None;
+			for move in moves:
+				delta = getScoreDelta(move);
+				if bestDelta is None or delta > bestDelta:
+					bestMove = move;
+					bestDelta = delta;
+			# > stop hill climbing as soon as no move improves the score (L)
+			if tabuLength == 0 and bestDelta <= MIN_STRUCTURE_SCORE_IMPROVEMENT:
+				break;
+			# > make the move (L)
+			(description, movedEdge, changedFamilies) = bestMove;
+			for (nodeName,parentNames) in changedFamilies:
+				dict_parentsForNodeNames[nodeName] = parentNames;
+			tabuEdges.append(movedEdge);
+			currentScore += bestDelta;
+			print("-- structure search: iteration {0}: {1} ({2:+.3f}) => {3:.3f}".format(iteration+1, description, bestDelta, currentScore));
+			# > remember the best network (L)
+			if currentScore > bestScore + MIN_STRUCTURE_SCORE_IMPROVEMENT:
+				bestScore = currentScore;
+				bestParents = copy.deepcopy(dict_parentsForNodeNames);
+				numberOfIterationsWithoutImprovement = 0;
+			else:
+				numberOfIterationsWithoutImprovement += 1;
+				if numberOfIterationsWithoutImprovement >= tabuLength:
+					# ! the tabu search did not find anything better for a while > stop (L)
+					break;
+	# ! the search is done > rewire the network with the best parents found. (L)
+	print("-- structure search: best score ({0}) = {1:.3f}".format(structureScore, bestScore));
+	for nodeName,node in network.items():
+		node['parents'] = [];
+		node['children'] = [];
+	for nodeName in nodeNames:
+		for parentName in bestParents[nodeName]:
+			network[nodeName]['parents'].append(network[parentName]);
+			network[parentName]['children'].append(network[nodeName]);
+	# > make sure the learned network has no loops and no family with more parents than allowed (L)
+	checkNetworkForLoops();
+	for nodeName,node in network.items():
+		if len(node['parents']) > maxInDegree:
+			errorAndExit("structure search: the learned network has "+str(len(node['parents']))+" parents for node '"+nodeName+"' ('max_in_degree' is "+str(maxInDegree)+")");
+# (<I>)
+def getStructureMoves(dict_parentsForNodeNames, allowedEdges, tabuEdges):
+	# (F)
+	# ? a move is a tuple (description, movedEdge, [(nodeName, newParentNames), ...]). Moves that would create a loop, 
+	# exceed the maximum number of parents or change a tabu edge are left out.
+	moves = [];
+	allowedEdgesAsSet = set(allowedEdges);
+	# ------------------------- families over the limit
+	# ? while a family has more parents than allowed, the only moves are the ones that lower its in-degree: the
+	# removals of its parent edges (tabu or not).
+	overLimitNodeNames = [nodeName for nodeName,parentNames in dict_parentsForNodeNames.items() if len(parentNames) > maxInDegree];
+	if len(overLimitNodeNames) > 0:
+		for targetName in overLimitNodeNames:
+			parentNames = dict_parentsForNodeNames[targetName];
+			for sourceName in parentNames:
+				remainingParents = [parentName for parentName in parentNames if parentName != sourceName];
+				moves.append(("remove "+sourceName+" -> "+targetName, (sourceName,targetName), [(targetName, remainingParents)]));
+		return moves;
+	# ------------------------- remove & reverse
+	for targetName,parentNames in dict_parentsForNodeNames.items():
+		for sourceName in parentNames:
+			if (sourceName,targetName) in tabuEdges: continue;
+			remainingParents = [parentName for parentName in parentNames if parentName != sourceName];
+			moves.append(("remove "+sourceName+" -> "+targetName, (sourceName,targetName), [(targetName, remainingParents)]));
+			# > reversing: the reversed edge has to be allowed, too.
+			if (targetName,sourceName) not in allowedEdgesAsSet: continue;
+			if len(dict_parentsForNodeNames[sourceName]) >= maxInDegree: continue;
+			# ? the reversed edge (target -> source) creates a loop if there is another path from source to target,
+			# i.e. if the source is still an ancestor of the target after the edge is removed.
+			dict_parentsAfterRemoval = dict(dict_parentsForNodeNames);
+			dict_parentsAfterRemoval[targetName] = remainingParents;
+			if isAncestor(dict_parentsAfterRemoval, targetName, sourceName): continue;
+			moves.append(("reverse "+sourceName+" -> "+targetName, (targetName,sourceName),
+				[(targetName, remainingParents), (sourceName, dict_parentsForNodeNames[sourceName]+[targetName])]));
+	# ------------------------- add
+	for (sourceName,targetName) in allowedEdges:
+		if (sourceName,targetName) in tabuEdges: continue;
+		parentNames = dict_parentsForNodeNames[targetName];
+		if sourceName in parentNames or targetName in dict_parentsForNodeNames[sourceName]: continue;
+		if len(parentNames) >= maxInDegree: continue;
+		# ? the edge creates a loop if the target is already an ancestor of the source.
+		if isAncestor(dict_parentsForNodeNames, sourceName, targetName): continue;
+		moves.append(("add "+sourceName+" -> "+targetName, (sourceName,targetName), [(targetName, parentNames+[sourceName])]));
+	return moves;
+# 
+def isAncestor(dict_parentsForNodeNames, nodeName, ancestorName):
+	# (F+)
+	# > walk up the parents of the node and look for the ancestor (L)
+	nodesToVisit = list(dict_parentsForNodeNames[nodeName]);
+	visitedNodes = set();
+	while len(nodesToVisit) > 0:
+		currentName = nodesToVisit.pop();
+		if currentName == ancestorName:
+			return True;
+		if currentName in visitedNodes: continue;
+		visitedNodes.add(currentName);
+		nodesToVisit.extend(dict_parentsForNodeNames[currentName]);
+	return False;
 # 
-def createXmlFromNetwork():
+def getScoreWorkerState(rowCountTable):
+	# (F+)
+	return (network, rowCountTable, dataThreshold, numberOfCsvRows);
+# 
+scoreWorker_rowCountTable = None;
+def initializeScoreWorker(workerNetwork, rowCountTable, workerDataThreshold, workerNumberOfCsvRows):
+	# (F+)
+	global network, scoreWorker_rowCountTable, dataThreshold, numberOfCsvRows;
+	network = workerNetwork;
+	scoreWorker_rowCountTable = rowCountTable;
+	dataThreshold = workerDataThreshold;
+	numberOfCsvRows = workerNumberOfCsvRows;
+# 
+def calculateFamilyScore_inWorker(familyKey):
+	# (F+)
+	(nodeName, parentNames) = familyKey;
+	return calculateFamilyScore(scoreWorker_rowCountTable, nodeName, parentNames);
+# (<I>)
+def writeLearnedEdgesFile():
+	# (F)
+	# ? the learned edges are written as an 'edges' block that can be pasted into the config file.
+	pathToEdgesFile = getPathToLearnedEdgesFile();
+	edges = [parent['name']+" -> "+nodeName for nodeName,node in network.items() for parent in node['parents']];
+	edgesBlock = '"edges": '+json.dumps(edges, indent="\t");
+	try:
+		with open(pathToEdgesFile, 'w', newline='') as edgesFile:
+			edgesFile.write(edgesBlock+"\n");
+	except IOError as e:
+		errorAndExit("could not write to edges file: "+pathToEdgesFile,e);
+	print(edgesBlock);
+# 
+def getPathToLearnedEdgesFile():
+	# (F+)
+	return getOutputBasePath()+".edges.json";
+# (<I>) ------------------------------ QUERY ------------------------------
+def answerQueries():
+	# (F)
+	# ? the calculated network is compiled by the inference module, which answers P(query node | evidence) for
+	# every row of the evidence file (the columns are named like the columns of the input csv file; empty fields 
+	# are not observed, the query node's own column is ignored).
+	global numberOfQueries, queryDuration;
+	if inference is None or numpy is None:
+		errorAndExit("the query command needs the python package 'numpy'");
+	if queryNodeName not in network:
+		errorAndExit("bad argument: the query node does not exist: "+queryNodeName);
+	compiledNetwork = inference.compileNetwork(network);
+	try:
+		evidenceRows = inference.readEvidenceCsvFile(pathToEvidenceCsvFile, dict_csvNamesToNodeNames, csvDelimiter);
+		# > the evidence uses the original values > map merged values (see mergeRareValues()) (L)
+		for evidence in evidenceRows:
+			for nodeName,value in evidence.items():
+				if 'valueMapping' in network[nodeName]:
+					evidence[nodeName] = network[nodeName]['valueMapping'].get(value, value);
+	except IOError as e:
+		errorAndExit("could not open the evidence csv file: "+pathToEvidenceCsvFile, e);
+	startTime = time.time();
+	try:
+		posteriors = inference.getPosteriorBatch(compiledNetwork, queryNodeName, evidenceRows);
+	except ValueError as e:
+		errorAndExit("bad evidence file: "+pathToEvidenceCsvFile, e);
+	queryDuration = time.time()-startTime;
+	numberOfQueries = len(evidenceRows);
+	try:
+		inference.writePosteriorsFile(getPathToPosteriorsFile(), compiledNetwork, queryNodeName, evidenceRows, posteriors);
+	except IOError as e:
+		errorAndExit("could not write to posteriors file: "+getPathToPosteriorsFile(), e);
+# 
+def getPathToPosteriorsFile():
+	# (F+)
+	return getOutputBasePath()+".posteriors.tsv";
+# (<I>) ------------------------------ BOOTSTRAP ------------------------------
+def calculateBootstrapIntervals(rowCountTable):
+	# (F)
+	# ? idea: to get error bars for the cpd entries, the csv rows are resampled many times (replicates) and
+	# the cpds are recalculated for every replicate. Instead of resampling the rows, every row gets a random
+	# Poisson(1) weight per replicate (poisson bootstrap). Since the rows are compacted, a unique row with weight m
+	# gets the sum of m Poisson(1) weights, which is a single Poisson(m) weight.
+	# With the weights of all replicates in one matrix (replicates x unique rows), the family counts of all
+	# replicates are a single scatter-add of those weights into the family's cells per node. The cpds of all
+	# replicates are then calculated the same way calculateCPDs() and approximateCpdRowForDataShortage() do it,
+	# and the percentiles of every cpd entry over the replicates give the interval.
+	# ------------------------- 
+	if numpy is None:
+		errorAndExit("the bootstrap needs the python package 'numpy'");
+	nodeNames = list(network.keys());
+	# > encode every unique row as the indices of its values (-1 for missing values) (L)
+	dict_indicesForNodeValues = [{value:i for i,value in enumerate(network[nodeName]['values'])} for nodeName in nodeNames];
+	rowValueIndices = numpy.array(
+		[[(-1 if value is None else dict_indicesForNodeValues[j][value]) for j,value in enumerate(projectedRow)] for projectedRow in rowCountTable.keys()],
+		dtype=numpy.int64).reshape(len(rowCountTable), len(nodeNames));
+	# > draw the weights of all replicates at once (L) {{numberOfBootstrapReplicates}}
+	rowWeights = numpy.array(list(rowCountTable.values()));
+	randomGenerator = numpy.random.default_rng(bootstrapSeed);
+	replicateWeights = randomGenerator.poisson(rowWeights, size=(numberOfBootstrapReplicates, len(rowWeights))).astype(numpy.float64);
+	# > describe the family of every node by the column indices and cardinalities of its parents (L)
+	tasks = [];
+	for nodeName,node in network.items():
+		parentColumns = [nodeNames.index(parent['name']) for parent in node['parents']];
+		parentCardinalities = [len(parent['values']) for parent in node['parents']];
+		tasks.append((nodeName, parentColumns, nodeNames.index(nodeName), parentCardinalities, len(node['values'])));
+	# > calculate the intervals of the nodes in parallel, one node per task (L)
+	workerState = (rowValueIndices, replicateWeights, dataThreshold, bootstrapConfidence);
+	numberOfProcesses = min(len(tasks), os.cpu_count() or 1);
+	if numberOfProcesses > 1:
+		with multiprocessing.Pool(numberOfProcesses, initializer=initializeBootstrapWorker, initargs=workerState) as pool:
+			results = pool.map(calculateBootstrapIntervalsForNode, tasks);
+	else:
+		initializeBootstrapWorker(*workerState);
+		results = [calculateBootstrapIntervalsForNode(task) for task in tasks];
+	# > write the intervals to the network nodes (L)
+	for (nodeName,lowerBounds,upperBounds) in results:
+		network[nodeName]['cpdIntervals'] = (lowerBounds, upperBounds);
+# 
+bootstrap_rowValueIndices = None;
+bootstrap_replicateWeights = None;
+bootstrap_dataThreshold = None;
+bootstrap_confidence = None;
+def initializeBootstrapWorker(rowValueIndices, replicateWeights, threshold, confidence):
+	# (F+)
+	# ? the (large) replicate weights are handed to every worker once, instead of once per task.
+	global bootstrap_rowValueIndices, bootstrap_replicateWeights, bootstrap_dataThreshold, bootstrap_confidence;
+	bootstrap_rowValueIndices = rowValueIndices;
+	bootstrap_replicateWeights = replicateWeights;
+	bootstrap_dataThreshold = threshold;
+	bootstrap_confidence = confidence;
+# (<I>)
+def calculateBootstrapIntervalsForNode(task):
+	# (F)
+	(nodeName, parentColumns, nodeColumn, parentCardinalities, numberOfValues) = task;
+	numberOfReplicates = bootstrap_replicateWeights.shape[0];
+	numberOfParents = len(parentColumns);
+	numberOfConditions = reduce(operator.mul, parentCardinalities, 1);
+	valueIndices = bootstrap_rowValueIndices[:, nodeColumn];
+	parentValueIndices = bootstrap_rowValueIndices[:, parentColumns];
+	uniformProbability = 1.0/numberOfValues;
+	# ------------------------- single parents
+	# > calculate the cpd rows for every single parent and all replicates (see approximateCpdRowForDataShortage()) (L)
+	singleParentDistributions = [];
+	for i in range(0,numberOfParents):
+		cardinality = parentCardinalities[i];
+		isCounted = (parentValueIndices[:,i] >= 0) & (valueIndices >= 0);
+		# > add the weights of every unique row to its cell (parentValue, nodeValue), for all replicates at once. (L)
+		counts = getBootstrapCellCounts(isCounted, parentValueIndices[isCounted,i]*numberOfValues + valueIndices[isCounted], cardinality*numberOfValues).reshape(numberOfReplicates, cardinality, numberOfValues);
+		totals = counts.sum(axis=2, keepdims=True);
+		# > use the uniform distribution where there is not enough data for this parent value.
+		singleParentDistributions.append(numpy.where(totals > bootstrap_dataThreshold, counts/numpy.maximum(totals,1), uniformProbability));
+	# ------------------------- full conditions
+	# ? only conditions that occur in the data can ever have enough data (the weight of a row is 0 in every
+	# replicate if the row does not exist), so only those are counted. 
+	isCounted = (parentValueIndices >= 0).all(axis=1) & (valueIndices >= 0);
+	if numberOfParents > 0:
+		conditionIndices = numpy.ravel_multi_index(tuple(parentValueIndices[isCounted].T), parentCardinalities);
+	else:
+		conditionIndices = numpy.zeros(numpy.count_nonzero(isCounted), dtype=numpy.int64);
+	observedConditions, rowsToObservedConditions = numpy.unique(conditionIndices, return_inverse=True);
+	observedCounts = getBootstrapCellCounts(isCounted, rowsToObservedConditions*numberOfValues + valueIndices[isCounted], len(observedConditions)*numberOfValues).reshape(numberOfReplicates, len(observedConditions), numberOfValues);
+	observedTotals = observedCounts.sum(axis=2, keepdims=True);
+	observedHasEnoughData = observedTotals > bootstrap_dataThreshold;
+	observedDistributions = observedCounts/numpy.maximum(observedTotals,1);
+	# ------------------------- percentiles
+	# ? the cpd of all replicates (replicates x conditions x values) can be huge, so it is calculated in blocks of conditions.
+	lowerPercentile = (1-bootstrap_confidence)/2*100;
+	upperPercentile = 100-lowerPercentile;
+	lowerBounds = numpy.empty((numberOfConditions, numberOfValues));
+	upperBounds = numpy.empty((numberOfConditions, numberOfValues));
+	blockSize = max(1, BOOTSTRAP_BLOCK_SIZE//(numberOfReplicates*numberOfValues));
+	for start in range(0, numberOfConditions, blockSize):
+		stop = min(start+blockSize, numberOfConditions);
+		# > calculate the data shortage cpd rows for this block: the mean of the single parent cpd rows (L)
+		if numberOfParents > 0:
+			blockParentValueIndices = numpy.unravel_index(numpy.arange(start,stop), parentCardinalities);
+			distributions = sum([singleParentDistributions[i][:, blockParentValueIndices[i], :] for i in range(0,numberOfParents)])/numberOfParents;
+		else:
+			distributions = numpy.full((numberOfReplicates, stop-start, numberOfValues), uniformProbability);
+		# > use the normal cpd rows where a replicate has enough data for the condition (L)
+		first = numpy.searchsorted(observedConditions, start);
+		last = numpy.searchsorted(observedConditions, stop);
+		blockPositions = observedConditions[first:last]-start;
+		distributions[:, blockPositions, :] = numpy.where(observedHasEnoughData[:, first:last, :], observedDistributions[:, first:last, :], distributions[:, blockPositions, :]);
+		# > get the percentiles over the replicates (L)
+		(lowerBounds[start:stop], upperBounds[start:stop]) = numpy.percentile(distributions, [lowerPercentile, upperPercentile], axis=0);
+	# 
+	return (nodeName, lowerBounds, upperBounds);
+# 
+def getBootstrapCellCounts(isCounted, cellIndices, numberOfCells):
+	# (F+)
+	# ? sums the weights of the counted unique rows into their cells, for all replicates at once (replicates x cells).
+	# The cellIndices belong to the counted rows, in the order of the rows.
+	counts = numpy.zeros((bootstrap_replicateWeights.shape[0], numberOfCells));
+	numpy.add.at(counts, (slice(None), cellIndices), bootstrap_replicateWeights[:, isCounted]);
+	return counts;
+# (<I>)
+def writeBootstrapIntervalsFile():
+	# (F)
+	# > the intervals are written next to the xbif file (L)
+	pathToIntervalsFile = getPathToBootstrapIntervalsFile();
+	try:
+		with open(pathToIntervalsFile, 'w', newline='') as intervalsFile:
+			intervalsWriter = csv.writer(intervalsFile, delimiter='\t');
+			intervalsWriter.writerow(["node", "condition", "value", "probability", "lower", "upper"]);
+			for nodeName,node in network.items():
+				(lowerBounds, upperBounds) = node['cpdIntervals'];
+				# ? the conditions are generated in the same order as the rows of the cpd.
+				for i,condition in enumerate(generateConditions(node)):
+					conditionAsString = ", ".join([dict_csvNamesToNodeNames[parentCsvName]+"="+parentValue for (parentCsvName,parentValue) in condition]);
+					for j,value in enumerate(node['values']):
+						intervalsWriter.writerow([nodeName, conditionAsString, value, str(node['cpd'][i][j]), "{0:.6f}".format(lowerBounds[i][j]), "{0:.6f}".format(upperBounds[i][j])]);
+	except IOError as e:
+		errorAndExit("could not write to bootstrap file: "+pathToIntervalsFile,e);
+# 
+def getPathToBootstrapIntervalsFile():
+	# (F+)
+	return getOutputBasePath()+".bootstrap.tsv";
+# ------------------------------ OUTPUT FILES ------------------------------
+def writeOutputFiles():
+	# (F)
+	# ? idea: every output format is a writer with three functions: 'begin' (creates the writer's state for an
+	# output file), 'node' (adds a node to the state) and 'end' (writes the state to the file). The nodes and their
+	# cpds are converted (to strings and arrays) only once, in a single pass, and handed to every writer.
+	# ------------------------- 
+	writerStates = [];
+	for (outputFormat,pathToOutputFile) in getOutputFiles():
+		writer = OUTPUT_WRITERS[getOutputFormatWithoutCompression(outputFormat)];
+		writerStates.append((writer, writer['begin'](pathToOutputFile)));
+	# > the single pass over the calculated cpds (L)
+	for nodeName,node in network.items():
+		cpdAsStrings = [[str(p) for p in cpdRow] for cpdRow in node['cpd']];
+		for (writer,writerState) in writerStates:
+			writer['node'](writerState, nodeName, node, cpdAsStrings);
+	# > write the files (L)
+	for (writer,writerState) in writerStates:
+		try:
+			writer['end'](writerState);
+		except IOError as e:
+			errorAndExit("could not write to output file: "+writerState['path'],e);
+		except Exception as e:
+			print("unknown error!");
+			raise;
+# (<I>)
+def getOutputFiles():
+	# (F+)
+	# ? returns a list of (output format, path). Without the -f option, the format is taken from the output file path
+	# (xbif by default) and the file is written exactly there. With the -f option, every format is written next to it.
+	if outputFormats is None:
+		return [(getOutputFormatFromPath(pathToOutputXbifFile) or "xbif", pathToOutputXbifFile)];
+	return [(outputFormat, getOutputBasePath()+"."+outputFormat) for outputFormat in outputFormats];
+# 
+def getOutputFormatFromPath(path):
+	# (F+)
+	# > find the longest format that is a suffix of the path, e.g. 'xbif.gz' (L)
+	matchingFormats = [outputFormat for outputFormat in getAllOutputFormats() if path.endswith("."+outputFormat)];
+	if len(matchingFormats) == 0:
+		return None;
+	return max(matchingFormats, key=len);
+# 
+def getOutputBasePath():
+	# (F+)
+	# ? the output file path without the format suffix; the other files (bootstrap intervals etc.) are written next to it.
+	outputFormat = getOutputFormatFromPath(pathToOutputXbifFile);
+	if outputFormat is None:
+		return os.path.splitext(pathToOutputXbifFile)[0];
+	return pathToOutputXbifFile[:-len("."+outputFormat)];
+# 
+def getAllOutputFormats():
+	# (F+)
+	# > every writer, and the compressed variants of the text formats (L)
+	allOutputFormats = list(OUTPUT_WRITERS.keys());
+	for outputFormat,writer in OUTPUT_WRITERS.items():
+		if writer['compressible']:
+			allOutputFormats.extend([outputFormat+"."+compression for compression in OUTPUT_COMPRESSIONS]);
+	return allOutputFormats;
+# 
+def getOutputFormatWithoutCompression(outputFormat):
+	# (F+)
+	for compression in OUTPUT_COMPRESSIONS:
+		if outputFormat.endswith("."+compression):
+			return outputFormat[:-len("."+compression)];
+	return outputFormat;
+# 
+def openOutputFile(pathToOutputFile):
+	# (F+)
+	# > open the file for writing text, compressed according to its suffix (L)
+	if pathToOutputFile.endswith(".gz"):
+		return gzip.open(pathToOutputFile, 'wt', compresslevel=GZIP_COMPRESSION_LEVEL, newline='');
+	if pathToOutputFile.endswith(".xz"):
+		return lzma.open(pathToOutputFile, 'wt', newline='');
+	return open(pathToOutputFile, 'w', newline='');
+# (<I>) ------------------------------ OUTPUT XBIF ------------------------------
+def beginXbifFile(pathToOutputFile):
+	# (F+)
 	# ? more info on xbif format: http://www.cs.cmu.edu/~fgcozman/Research/InterchangeFormat/
 	bifTag = etree.Element("BIF", VERSION="0.3");
 	networkTag = etree.SubElement(bifTag, "NETWORK");
 	etree.SubElement(networkTag, "NAME").text = "TEST_NAME";
+	return {'path':pathToOutputFile, 'bifTag':bifTag, 'networkTag':networkTag};
+# 
+def addNodeToXbifFile(writerState, nodeName, node, cpdAsStrings):
+	# (F)
+	networkTag = writerState['networkTag'];
+	# ------------------------------ VARIABLE ------------------------------
+	variableTag = etree.SubElement(networkTag, "VARIABLE", TYPE = "nature");
+	etree.SubElement(variableTag, "NAME").text = nodeName;
+	for value in node['values']:
+		etree.SubElement(variableTag, "OUTCOME").text = value;
 	# 
-	for nodeName,node in network.items():
-		# ------------------------------ VARIABLE ------------------------------
-		variableTag = etree.SubElement(networkTag, "VARIABLE", TYPE = "nature");
-		etree.SubElement(variableTag, "NAME").text = nodeName;
-		for value in node['values']:
-			etree.SubElement(variableTag, "OUTCOME").text = value;
-		# 
-		etree.SubElement(variableTag, "PROPERTY").text = "position = ("+str(node['column']*gridSizeX)+","+str(node['row']*gridSizeY)+")";
-		# ------------------------------ DEFINITION ------------------------------
-		# > create the definition tag (which defines the edges and the CPD);
-		definitionTag = etree.SubElement(networkTag, "DEFINITION");
-		# > add the FOR-tag as a reference to the node/variable.
-		etree.SubElement(definitionTag, "FOR").text = nodeName;
-		# > loop over the parents...
-		for parent in node['parents']:
-			# > add the parents name as a reference to the parent.
-			etree.SubElement(definitionTag, "GIVEN").text = dict_csvNamesToNodeNames[parent['csvName']];
-		# > get the cpd from the node and convert it into a pretty string.
-		cpdAsString = "\n".join([" ".join(map(lambda p: str(p),cpdRow)) for cpdRow in node['cpd']]);
-		# > add the cpd between TABLE-tags.
-		etree.SubElement(definitionTag, "TABLE").text = cpdAsString;
-	# 
-	return bifTag;
+	etree.SubElement(variableTag, "PROPERTY").text = "position = ("+str(node['column']*gridSizeX)+","+str(node['row']*gridSizeY)+")";
+	if len(node.get('mergedValues', {})) > 0:
+		# > document which original values were merged (L)
+		etree.SubElement(variableTag, "PROPERTY").text = "merged_values = "+json.dumps(node['mergedValues']);
+	# ------------------------------ DEFINITION ------------------------------
+	# > create the definition tag (which defines the edges and the CPD);
+	definitionTag = etree.SubElement(networkTag, "DEFINITION");
+	# > add the FOR-tag as a reference to the node/variable.
+	etree.SubElement(definitionTag, "FOR").text = nodeName;
+	# > loop over the parents...
+	for parent in node['parents']:
+		# > add the parents name as a reference to the parent.
+		etree.SubElement(definitionTag, "GIVEN").text = dict_csvNamesToNodeNames[parent['csvName']];
+	# > get the cpd from the node and convert it into a pretty string.
+	cpdAsString = "\n".join([" ".join(cpdRow) for cpdRow in cpdAsStrings]);
+	# > add the cpd between TABLE-tags.
+	etree.SubElement(definitionTag, "TABLE").text = cpdAsString;
+# 
+def endXbifFile(writerState):
+	# (F+)
+	xmlNetworkAsString = "\n\n"+str(etree.tostring(writerState['bifTag'], pretty_print=prettyPrint),encoding='utf-8');
+	with openOutputFile(writerState['path']) as outputXbifFile:
+		outputXbifFile.write(XML_DTD_XBIF)
+		outputXbifFile.write(xmlNetworkAsString)
+# (<I>) ------------------------------ OUTPUT BIF ------------------------------
+def beginBifFile(pathToOutputFile):
+	# (F+)
+	# ? the classic (non-xml) BIF format, as read by e.g. bnlearn or pgmpy. The lines are collected and written at the end.
+	return {'path':pathToOutputFile, 'variableLines':[], 'probabilityLines':[]};
+# 
+def addNodeToBifFile(writerState, nodeName, node, cpdAsStrings):
+	# (F)
+	indentation = "\t" if prettyPrint else "";
+	# ------------------------------ variable ------------------------------
+	# ? BIF values have to be identifiers, so the values are written as identifiers and the original names as properties.
+	dict_identifiersForValues = getBifIdentifiers(node['values']);
+	variableLines = writerState['variableLines'];
+	variableLines.append("variable "+nodeName+" {");
+	variableLines.append(indentation+"type discrete [ "+str(len(node['values']))+" ] { "+", ".join(dict_identifiersForValues.values())+" };");
+	variableLines.append(indentation+"property position = ("+str(node['column']*gridSizeX)+", "+str(node['row']*gridSizeY)+");");
+	for value,identifier in dict_identifiersForValues.items():
+		if identifier != value:
+			variableLines.append(indentation+"property original_value_"+identifier+" = "+getBifPropertyText(value)+";");
+	for value,originalValues in node.get('mergedValues', {}).items():
+		variableLines.append(indentation+"property merged_values_"+dict_identifiersForValues[value]+" = "+" | ".join([getBifPropertyText(originalValue) for originalValue in originalValues])+";");
+	variableLines.append("}");
+	# ------------------------------ probability ------------------------------
+	probabilityLines = writerState['probabilityLines'];
+	parentNames = [parent['name'] for parent in node['parents']];
+	if len(parentNames) == 0:
+		probabilityLines.append("probability ( "+nodeName+" ) {");
+		probabilityLines.append(indentation+"table "+", ".join(cpdAsStrings[0])+";");
+	else:
+		probabilityLines.append("probability ( "+nodeName+" | "+", ".join(parentNames)+" ) {");
+		dict_identifiersForParentValues = {parent['csvName']:getBifIdentifiers(parent['values']) for parent in node['parents']};
+		# ? the cpd rows are in the order of the generated conditions.
+		for condition,cpdRow in zip(generateConditions(node), cpdAsStrings):
+			probabilityLines.append(indentation+"("+", ".join([dict_identifiersForParentValues[parentColumnName][parentValue] for (parentColumnName,parentValue) in condition])+") "+", ".join(cpdRow)+";");
+	probabilityLines.append("}");
+# 
+def getBifIdentifiers(values):
+	# (F+)
+	# ? maps each value to an identifier: every non-word character is replaced by '_', and a number is appended if that
+	# makes two values of the same node equal. The mapping only depends on the values (and their order), so parents map the same way.
+	dict_identifiersForValues = collections.OrderedDict();
+	for value in values:
+		identifier = re.sub(r'\W', '_', value);
+		uniqueIdentifier = identifier;
+		suffix = 2;
+		while uniqueIdentifier in dict_identifiersForValues.values():
+			uniqueIdentifier = identifier+"_"+str(suffix);
+			suffix += 1;
+		dict_identifiersForValues[value] = uniqueIdentifier;
+	return dict_identifiersForValues;
+# 
+def getBifPropertyText(text):
+	# (F+)
+	# ? property texts end at the next ';' and must not open or close blocks or strings.
+	return re.sub(r'[;{}"]', '_', text);
+# 
+def endBifFile(writerState):
+	# (F+)
+	with openOutputFile(writerState['path']) as outputBifFile:
+		outputBifFile.write("network TEST_NAME {\n}\n");
+		outputBifFile.write("\n".join(writerState['variableLines'])+"\n");
+		outputBifFile.write("\n".join(writerState['probabilityLines'])+"\n");
+# (<I>) ------------------------------ OUTPUT NPZ ------------------------------
+def beginNpzFile(pathToOutputFile):
+	# (F+)
+	# ? a (compressed) numpy archive: one array 'cpd_<nodeName>' per node with one axis per parent and the last axis
+	# for the node's values, and a json string 'metadata' with the nodes (name, values, parents, position).
+	# Load it with: archive = numpy.load(path); metadata = json.loads(str(archive['metadata']))
+	if numpy is None:
+		errorAndExit("the npz output format needs the python package 'numpy'");
+	return {'path':pathToOutputFile, 'arrays':{}, 'nodes':[]};
+# 
+def addNodeToNpzFile(writerState, nodeName, node, cpdAsStrings):
+	# (F+)
+	shape = [len(parent['values']) for parent in node['parents']] + [len(node['values'])];
+	writerState['arrays']["cpd_"+nodeName] = numpy.array(cpdAsStrings, dtype=numpy.float64).reshape(shape);
+	writerState['nodes'].append({
+		'name': nodeName,
+		'values': node['values'],
+		'parents': [parent['name'] for parent in node['parents']],
+		'position': [node['column']*gridSizeX, node['row']*gridSizeY],
+		'mergedValues': node.get('mergedValues', {})
+	});
+# 
+def endNpzFile(writerState):
+	# (F+)
+	with open(writerState['path'], 'wb') as outputNpzFile:
+		numpy.savez_compressed(outputNpzFile, metadata=numpy.array(json.dumps({'nodes':writerState['nodes']})), **writerState['arrays']);
+# ------------------------------ 
+# ? the writers of the output formats (see writeOutputFiles()). 'compressible' formats can also be written as .gz or .xz.
+OUTPUT_WRITERS = collections.OrderedDict([
+	("xbif", {'begin':beginXbifFile, 'node':addNodeToXbifFile, 'end':endXbifFile, 'compressible':True}),
+	("bif", {'begin':beginBifFile, 'node':addNodeToBifFile, 'end':endBifFile, 'compressible':True}),
+	("npz", {'begin':beginNpzFile, 'node':addNodeToNpzFile, 'end':endNpzFile, 'compressible':False})
+]);
 
 def printIncompatibleNodes(csvFileAsList):
 	networkAsList = list(network.items());
@@ -825,24 +2130,40 @@ def printIncompatibleNodes(csvFileAsList):
 
 
 # ============================== EXECUTION ==============================
-# > set the decimal precision to fit samiam.
-# getcontext().prec = SAMIAM_PRECISION;
-# > only round down, so rounding errors can be measured 
-# getcontext().rounding = ROUND_FLOOR;
-# ------------------------- 
-parseCommandLineArguments()
-parseConfigJsonFile()
-estimateComplexity();
-# cProfile.run('parseInputCsvFile()'); # (B:done)
-parseInputCsvFile()
-writeOutputXbifFile()
-# > give feedback
-print("\n\n");
-print("-- Output written to {outfile}.".format(outfile=pathToOutputXbifFile))
-print("-- There was data shortage for {0} out of {1} calculated PDs ({2:.{digits}f}%)".format(
-	numberOfPDsWithLittleData,
-	numberOfCalculatedPDs,
-	(numberOfPDsWithLittleData/numberOfCalculatedPDs)*100,digits=2))
-# -------------------------  
+# ? the execution is guarded, so worker processes (see getShardCountTables()) can import this file without running it.
+if __name__ == "__main__":
+	# > set the decimal precision to fit samiam.
+	# getcontext().prec = SAMIAM_PRECISION;
+	# > only round down, so rounding errors can be measured 
+	# getcontext().rounding = ROUND_FLOOR;
+	# ------------------------- 
+	parseCommandLineArguments()
+	parseConfigJsonFile()
+	estimateComplexity();
+	# cProfile.run('parseInputCsvFile()'); # (B:done)
+	parseInputCsvFile()
+	writeOutputFiles()
+	if numberOfBootstrapReplicates > 0:
+		writeBootstrapIntervalsFile()
+	if command == COMMAND__LEARN:
+		writeLearnedEdgesFile()
+	if command == COMMAND__QUERY:
+		answerQueries()
+	# > give feedback
+	print("\n\n");
+	for (outputFormat,pathToOutputFile) in getOutputFiles():
+		print("-- Output ({format}) written to {outfile}.".format(format=outputFormat, outfile=pathToOutputFile))
+	if command == COMMAND__LEARN:
+		print("-- Learned edges written to {0}.".format(getPathToLearnedEdgesFile()))
+	if command == COMMAND__QUERY:
+		print("-- Answered {0} queries in {1:.3f}s, posteriors written to {2}.".format(numberOfQueries, queryDuration, getPathToPosteriorsFile()))
+	if numberOfBootstrapReplicates > 0:
+		print("-- Bootstrap intervals ({0} replicates) written to {1}.".format(numberOfBootstrapReplicates, getPathToBootstrapIntervalsFile()))
+	print("-- Compacted {0} csv rows into {1} unique rows".format(numberOfCsvRows, numberOfUniqueRows))
+	print("-- There was data shortage for {0} out of {1} calculated PDs ({2:.{digits}f}%)".format(
+		numberOfPDsWithLittleData,
+		numberOfCalculatedPDs,
+		(numberOfPDsWithLittleData/numberOfCalculatedPDs)*100,digits=2))
+	# -------------------------  
 # END OF FILE (L)
 
@@ -0,0 +1,47 @@
+import script
+
+
+def getMoveDescriptions(dict_parentsForNodeNames):
+	allowedEdges = [(source,target) for source in dict_parentsForNodeNames for target in dict_parentsForNodeNames if source != target];
+	return [description for (description,_,_) in script.getStructureMoves(dict_parentsForNodeNames, allowedEdges, [])];
+
+
+def test_reversing_an_edge_with_another_path_is_not_offered():
+	# ? A -> B -> C and A -> C: reversing A -> C would create the loop A -> B -> C -> A.
+	moveDescriptions = getMoveDescriptions({'A':[], 'B':['A'], 'C':['A','B']});
+	assert "reverse A -> C" not in moveDescriptions;
+	assert "reverse A -> B" in moveDescriptions or "reverse B -> C" in moveDescriptions;
+
+
+def test_no_move_creates_a_loop():
+	dict_parentsForNodeNames = {'A':[], 'B':['A'], 'C':['A','B']};
+	allowedEdges = [(source,target) for source in dict_parentsForNodeNames for target in dict_parentsForNodeNames if source != target];
+	for (description,_,changedFamilies) in script.getStructureMoves(dict_parentsForNodeNames, allowedEdges, []):
+		dict_parentsAfterMove = dict(dict_parentsForNodeNames);
+		dict_parentsAfterMove.update(dict(changedFamilies));
+		for nodeName in dict_parentsAfterMove:
+			assert not script.isAncestor(dict_parentsAfterMove, nodeName, nodeName), description;
+
+
+def test_families_over_the_in_degree_limit_can_only_lose_parents(monkeypatch):
+	monkeypatch.setattr(script, "maxInDegree", 1);
+	moveDescriptions = getMoveDescriptions({'A':[], 'B':[], 'C':['A','B']});
+	assert sorted(moveDescriptions) == ["remove A -> C", "remove B -> C"];
+
+
+def test_learned_network_obeys_the_in_degree_limit(monkeypatch):
+	# ? C copies A, so the repair has to keep A -> C and remove B -> C.
+	network = {};
+	for nodeName in ['A','B','C']:
+		network[nodeName] = {'name':nodeName, 'csvName':nodeName, 'values':["0","1"], 'parents':[], 'children':[]};
+	for parentName in ['A','B']:
+		network['C']['parents'].append(network[parentName]);
+		network[parentName]['children'].append(network['C']);
+	rowCountTable = {("0","0","0"):10, ("0","1","0"):10, ("1","0","1"):10, ("1","1","1"):10};
+	monkeypatch.setattr(script, "network", network);
+	monkeypatch.setattr(script, "numberOfCsvRows", 40);
+	monkeypatch.setattr(script, "dict_familyScoresForFamilies", {});
+	monkeypatch.setattr(script, "maxInDegree", 1);
+	monkeypatch.setattr(script, "maxIterations", 0);
+	script.learnNetworkStructure(rowCountTable);
+	assert [parent['name'] for parent in network['C']['parents']] == ['A'];